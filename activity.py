@@ -0,0 +1,213 @@
+"""Append-only activity log: event writer, group commit for check-offs, and rebuilding counters/streaks from the log.
+
+Check-offs go through group_commit(): ones that arrive while another commit to the same database is in
+flight wait and are then committed together, one transaction (one fsync) for the whole burst. Each
+caller still returns only after its own check-off and events have committed.
+
+Action types: schedule_done, commitment_day_done, reminder_done, counter_increment, streak_log.
+target_id is the schedule item / reminder / counter / streak id the event applies to.
+
+Rebuild after a restore or a bad write: python activity.py rebuild
+"""
+import argparse
+import threading
+from datetime import date, datetime
+from typing import Optional
+
+from db import bump_data_generation, current_db_path, get_conn, init_db, now_iso
+from scheduler import RECURRING_SQL
+
+
+def event_row(
+    action_type: str,
+    commitment_id: Optional[int] = None,
+    target_id: Optional[int] = None,
+    amount: int = 1,
+    date_str: Optional[str] = None,
+    notes: Optional[str] = None,
+) -> tuple:
+    return (commitment_id, action_type, target_id, amount, date_str or date.today().isoformat(), notes, now_iso())
+
+
+def write_events(cur, events: list) -> None:
+    """Append events (event_row keyword dicts) in the caller's transaction, so the log commits
+    together with the state change it records and rebuild_from_log never sees one without the other."""
+    if events:
+        cur.executemany(
+            """INSERT INTO activity_log (commitment_id, action_type, target_id, amount, date, notes, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [event_row(**event) for event in events],
+        )
+
+
+class _Pending:
+    """One check-off waiting in group_commit()."""
+
+    __slots__ = ("op", "args", "result", "error", "done")
+
+    def __init__(self, op, args: tuple):
+        self.op, self.args = op, args
+        self.result = self.error = None
+        self.done = False
+
+
+_group = threading.Condition()
+_queued: dict = {}  # db path -> check-offs waiting for the next commit
+_committing: set = set()  # db paths with a group commit in flight in this process
+
+
+def group_commit(op, *args):
+    """Run op(cur, *args, events) and log the events it appends, in a write transaction shared with
+    the check-offs other threads issue meanwhile. Returns once that transaction has committed: op's
+    result, or op's exception re-raised (the other check-offs in the group still commit)."""
+    path = str(current_db_path())
+    mine = _Pending(op, args)
+    with _group:
+        _queued.setdefault(path, []).append(mine)
+        while not mine.done and path in _committing:
+            _group.wait()
+        if not mine.done:
+            # No commit in flight: take everything queued for this database and commit it
+            batch = _queued.pop(path)
+            _committing.add(path)
+    if not mine.done:
+        try:
+            _commit_group(batch)
+        finally:
+            with _group:
+                _committing.discard(path)
+                _group.notify_all()
+    if mine.error is not None:
+        raise mine.error
+    return mine.result
+
+
+def _commit_group(batch: list) -> None:
+    """One transaction for the batch; each check-off gets a savepoint, so one failing doesn't undo the rest."""
+    events: list = []
+    try:
+        conn = get_conn()
+        try:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            for p in batch:
+                mark = len(events)
+                cur.execute("SAVEPOINT checkoff")
+                try:
+                    p.result = p.op(cur, *p.args, events)
+                except Exception as e:
+                    cur.execute("ROLLBACK TO checkoff")
+                    del events[mark:]
+                    p.error = e
+                cur.execute("RELEASE checkoff")
+            write_events(cur, events)
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        for p in batch:
+            p.error = p.error or e
+        events = []
+    finally:
+        for p in batch:
+            p.done = True
+    if events:
+        bump_data_generation()
+
+
+def _event_rows(cur, action_type: str):
+    """(target_id, date, amount) for an action type from live and archived events."""
+    cur.execute(
+        """SELECT target_id, date, amount FROM activity_log WHERE action_type = ?
+           UNION ALL
+           SELECT target_id, date, amount FROM activity_daily_summary WHERE action_type = ?""",
+        (action_type, action_type),
+    )
+    return cur.fetchall()
+
+
+def _runs_from_dates(dates) -> tuple:
+    """(current, longest, last) for a set of YYYY-MM-DD dates, matching update_streak's rules."""
+    days = sorted({datetime.strptime(d[:10], "%Y-%m-%d").date() for d in dates})
+    current = longest = 0
+    prev = None
+    for d in days:
+        current = current + 1 if prev is not None and (d - prev).days == 1 else 1
+        longest = max(longest, current)
+        prev = d
+    return current, longest, (prev.isoformat() if prev else None)
+
+
+def _dates_by_target(rows) -> dict:
+    out: dict = {}
+    for target_id, d, _amount in rows:
+        out.setdefault(target_id, set()).add(d)
+    return out
+
+
+def rebuild_from_log() -> dict:
+    """Recompute counters, streaks, commitment streaks and reminder done flags from the event log.
+    Best streaks never go down (they may predate the log). Returns rows updated per table."""
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        totals: dict = {}
+        for target_id, _d, amount in _event_rows(cur, "counter_increment"):
+            totals[target_id] = totals.get(target_id, 0) + (amount or 0)
+        cur.execute("SELECT id FROM counters")
+        counters = [(totals.get(row[0], 0), row[0]) for row in cur.fetchall()]
+        cur.executemany("UPDATE counters SET current_value = ? WHERE id = ?", counters)
+
+        streak_dates = _dates_by_target(_event_rows(cur, "streak_log"))
+        cur.execute("SELECT id, longest_streak FROM streaks")
+        streaks = []
+        for streak_id, longest in cur.fetchall():
+            current, run_best, last = _runs_from_dates(streak_dates.get(streak_id, ()))
+            streaks.append((current, max(longest or 0, run_best), last, streak_id))
+        cur.executemany(
+            "UPDATE streaks SET current_streak = ?, longest_streak = ?, last_activity_date = ? WHERE id = ?",
+            streaks,
+        )
+
+        day_dates = _dates_by_target(_event_rows(cur, "commitment_day_done"))
+        cur.execute("SELECT id, best_streak FROM commitments")
+        commitments = []
+        for cid, best in cur.fetchall():
+            current, run_best, last = _runs_from_dates(day_dates.get(cid, ()))
+            commitments.append((current, max(best or 0, run_best), last, cid))
+        cur.executemany(
+            "UPDATE commitments SET current_streak = ?, best_streak = ?, last_completed_date = ? WHERE id = ?",
+            commitments,
+        )
+
+        # Only one-off reminders: a recurring one's done flag is per occurrence (the dispatcher reopens it)
+        done = {target_id for target_id, _d, _a in _event_rows(cur, "reminder_done")}
+        cur.execute(f"SELECT id FROM reminders WHERE NOT {RECURRING_SQL}")
+        reminders = [(1 if row[0] in done else 0, row[0]) for row in cur.fetchall()]
+        cur.executemany("UPDATE reminders SET done = ? WHERE id = ?", reminders)
+        conn.commit()
+    finally:
+        conn.close()
+    bump_data_generation()
+    return {
+        "counters": len(counters),
+        "streaks": len(streaks),
+        "commitments": len(commitments),
+        "reminders": len(reminders),
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Activity log maintenance")
+    ap.add_argument("command", choices=["rebuild"])
+    args = ap.parse_args(argv)
+    init_db()
+    if args.command == "rebuild":
+        counts = rebuild_from_log()
+        print("Rebuilt from activity log: " + ", ".join(f"{n} {table}" for table, n in counts.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,14 +1,22 @@
 """Flask app: assistant UI, sync from Tumblr, today's plan."""
+import hashlib
+import hmac
+import json
 import os
+import random
 import re
+import traceback
+from urllib.parse import urlsplit
 from datetime import date
 
-from flask import Flask, render_template_string, request, jsonify, redirect, url_for, session
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, g, send_from_directory
 from flask_cors import CORS
+from markupsafe import escape
 from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.datastructures import MultiDict
 
-from config import tumblr_configured, tumblr_consumer_configured
-from db import init_db, set_setting
+from config import tumblr_configured, tumblr_consumer_configured, ADMIN_TOKEN, LIVE_UPDATES, PROFILE_SAMPLE_RATE
+from db import init_db, set_setting, use_user, reset_db, current_db_path, data_generation, using_db, set_sql_hook
 from sync import (
     sync_tumblr,
     get_schedule_items_for_date,
@@ -17,30 +25,104 @@ from sync import (
     get_streaks,
     get_punishment_triggers,
     generate_schedule_for_date,
+    generate_schedule_for_range,
+    date_range,
     get_pending_commitments,
     set_commitment_status,
     set_commitment_status_bulk,
-    get_all_commitments_for_manage,
+    set_commitment_status_matching,
+    MANAGE_PAGE_SIZE,
+    get_commitments_page,
 )
 from import_text import import_from_text
+from archive import get_completion_history
+from assets import asset_url, serve_asset
+from notify import notifier
+from search import search, SEARCH_LIMIT
+from transfer import export_ndjson, import_ndjson
+from profiling import PROFILE_DIR, Profile, list_profiles
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Gauge, instrument_app, observe_sql, render as render_metrics
+from cache import cached_brief, cached_heatmap, cached_message, cached_range, brief_cache
+from backup import start_backup, backup_running, list_backups, DEFAULT_KEEP
 from assistant import (
-    get_today_brief,
-    build_assistant_message,
     mark_schedule_done,
     mark_reminder_done,
     increment_counter,
     update_streak,
+    apply_checkoffs,
+    brief_delta,
     today_str,
+    MAX_RANGE_DAYS,
 )
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-change-in-production")
+app.config["LIVE_UPDATES"] = LIVE_UPDATES
 CORS(app)
 # So url_for(..., _external=True) uses https when behind Render's proxy
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
+app.jinja_env.globals["asset_url"] = asset_url
+instrument_app(app)
+set_sql_hook(observe_sql)
+Gauge("brief_cache_entries", "Entries in this worker's brief cache", lambda: brief_cache.stats()["size"])
+Gauge("brief_cache_hit_rate", "Brief cache hit rate since start", lambda: brief_cache.stats()["hit_rate"])
+Gauge("stream_subscribers", "Open /api/stream connections", notifier.subscriber_count)
 
 init_db()
 
+
+@app.before_request
+def _use_user_db():
+    """Signed-in Tumblr users get their own database; everyone else shares data/commitments.db."""
+    g.db_token = use_user(session.get("tumblr_user"))
+
+
+@app.teardown_request
+def _reset_user_db(exc=None):
+    token = g.pop("db_token", None)
+    if token is not None:
+        reset_db(token)
+
+
+# Never profiled: long-lived streams, static files and the endpoints used to read profiles
+_UNPROFILED_ENDPOINTS = {"api_stream", "asset", "static", "metrics", "admin_profiles", "admin_profile_file"}
+
+
+@app.before_request
+def _maybe_profile():
+    """Profile PROFILE_SAMPLE_RATE of requests, or one an admin asks for with X-Profile: 1 (see profiling.py)."""
+    if request.endpoint in _UNPROFILED_ENDPOINTS:
+        return
+    wanted = request.headers.get("X-Profile") == "1" and _is_admin()
+    if wanted or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE):
+        profile = Profile(f"{request.method} {request.path}").start()
+        if profile is not None:  # None: another request is being profiled
+            g.profile = profile
+
+
+@app.after_request
+def _note_profiled_status(response):
+    if "profile" in g:
+        g.profile_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def _save_profile(exc=None):
+    profile = g.pop("profile", None)
+    if profile is None:
+        return
+    try:
+        profile.stop().save(
+            method=request.method,
+            path=request.full_path.rstrip("?"),
+            route=request.url_rule.rule if request.url_rule is not None else None,
+            status=g.pop("profile_status", 500),
+        )
+    except Exception:
+        traceback.print_exc()  # profiling must never fail the request
+
+
 INDEX_HTML = """
 <!DOCTYPE html>
 <html lang="en">
@@ -51,94 +133,7 @@ INDEX_HTML = """
   <link rel="preconnect" href="https://fonts.googleapis.com">
   <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
   <link href="https://fonts.googleapis.com/css2?family=DM+Serif+Display&family=JetBrains+Mono:wght@400;500&display=swap" rel="stylesheet">
-  <style>
-    :root {
-      --bg: #0f0e14;
-      --surface: #1a1922;
-      --border: #2d2a3a;
-      --text: #e8e4ef;
-      --muted: #8b8499;
-      --accent: #c49ae8;
-      --accent-dim: #7b5a9e;
-      --success: #7dd3a3;
-      --warn: #e8b86d;
-    }
-    * { box-sizing: border-box; }
-    body {
-      font-family: 'JetBrains Mono', monospace;
-      background: var(--bg);
-      color: var(--text);
-      margin: 0;
-      min-height: 100vh;
-      line-height: 1.5;
-    }
-    .container { max-width: 640px; margin: 0 auto; padding: 1.5rem; }
-    h1 {
-      font-family: 'DM Serif Display', serif;
-      font-size: 1.75rem;
-      color: var(--accent);
-      margin-bottom: 0.5rem;
-    }
-    .sub { color: var(--muted); font-size: 0.85rem; margin-bottom: 1.5rem; }
-    nav {
-      display: flex;
-      gap: 0.75rem;
-      margin-bottom: 1.5rem;
-      flex-wrap: wrap;
-    }
-    nav a, .btn {
-      color: var(--accent);
-      text-decoration: none;
-      padding: 0.4rem 0.8rem;
-      border: 1px solid var(--border);
-      border-radius: 6px;
-      font-size: 0.85rem;
-      background: var(--surface);
-      cursor: pointer;
-      font-family: inherit;
-    }
-    nav a:hover, .btn:hover { border-color: var(--accent-dim); background: #252330; }
-    .card {
-      background: var(--surface);
-      border: 1px solid var(--border);
-      border-radius: 10px;
-      padding: 1.25rem;
-      margin-bottom: 1rem;
-    }
-    .card h2 { font-size: 1rem; color: var(--muted); margin: 0 0 0.75rem; text-transform: uppercase; letter-spacing: 0.05em; }
-    .card ul { margin: 0; padding: 0; list-style: none; }
-    .card li {
-      display: flex;
-      align-items: center;
-      justify-content: space-between;
-      padding: 0.5rem 0;
-      border-bottom: 1px solid var(--border);
-    }
-    .card li:last-child { border-bottom: none; }
-    .done { text-decoration: line-through; color: var(--muted); }
-    .btn-sm { padding: 0.25rem 0.5rem; font-size: 0.75rem; }
-    .message {
-      white-space: pre-wrap;
-      font-size: 0.9rem;
-      color: var(--text);
-    }
-    .message strong { color: var(--accent); }
-    .sync-result { font-size: 0.85rem; color: var(--muted); margin-top: 1rem; }
-    .sync-result .err { color: #e07a7a; }
-    .counter-row { display: flex; align-items: center; gap: 0.5rem; }
-    .counter-row span { flex: 1; }
-    input[type="text"] {
-      background: var(--bg);
-      border: 1px solid var(--border);
-      color: var(--text);
-      padding: 0.5rem;
-      border-radius: 6px;
-      font-family: inherit;
-      width: 100%;
-      max-width: 280px;
-    }
-    label { display: block; margin-bottom: 0.25rem; color: var(--muted); font-size: 0.85rem; }
-  </style>
+  <link rel="stylesheet" href="{{ asset_url('css/index.css') }}">
 </head>
 <body>
   <div class="container">
@@ -188,16 +183,19 @@ INDEX_HTML = """
       <h2>Schedule</h2>
       <ul>
         {% for s in data.schedule %}
-        <li>
+        <li id="schedule-{{ s.id }}">
           <span class="{{ 'done' if s.completed else '' }}">{{ s.title }}</span>
           {% if not s.completed %}
-          <form action="{{ url_for('mark_schedule_done_route', id=s.id) }}" method="post" style="display:inline;">
+          <form action="{{ url_for('mark_schedule_done_route', id=s.id) }}" method="post" style="display:inline;" data-checkoff="schedule" data-id="{{ s.id }}">
             <button type="submit" class="btn btn-sm">Done</button>
           </form>
           {% endif %}
         </li>
         {% endfor %}
       </ul>
+      {% if data.schedule_next %}
+      <a href="{{ url_for('index', schedule_after=data.schedule_next) }}" class="btn btn-sm">More →</a>
+      {% endif %}
     </div>
     {% endif %}
 
@@ -206,10 +204,10 @@ INDEX_HTML = """
       <h2>Reminders</h2>
       <ul>
         {% for r in data.reminders %}
-        <li>
+        <li id="reminder-{{ r.id }}">
           <span class="{{ 'done' if r.done else '' }}">{{ r.title }}</span>
           {% if not r.done %}
-          <form action="{{ url_for('mark_reminder_done_route', id=r.id) }}" method="post" style="display:inline;">
+          <form action="{{ url_for('mark_reminder_done_route', id=r.id) }}" method="post" style="display:inline;" data-checkoff="reminder" data-id="{{ r.id }}">
             <button type="submit" class="btn btn-sm">Done</button>
           </form>
           {% endif %}
@@ -224,10 +222,10 @@ INDEX_HTML = """
       <h2>Counters</h2>
       <ul>
         {% for c in data.counters %}
-        <li>
+        <li id="counter-{{ c.id }}">
           <div class="counter-row">
-            <span>{{ c.name }}: {{ c.current_value }}{% if c.target_value is not none %} / {{ c.target_value }}{% endif %}</span>
-            <form action="{{ url_for('increment_counter_route', id=c.id) }}" method="post" style="display:inline;">
+            <span data-name="{{ c.name }}">{{ c.name }}: {{ c.current_value }}{% if c.target_value is not none %} / {{ c.target_value }}{% endif %}</span>
+            <form action="{{ url_for('increment_counter_route', id=c.id) }}" method="post" style="display:inline;" data-checkoff="counter" data-id="{{ c.id }}">
               <button type="submit" class="btn btn-sm">+1</button>
             </form>
           </div>
@@ -242,10 +240,10 @@ INDEX_HTML = """
       <h2>Streaks</h2>
       <ul>
         {% for s in data.streaks %}
-        <li>
-          <span>{{ s.name }}: {{ s.current_streak }} days (best {{ s.longest_streak }})</span>
+        <li id="{{ 'streak-%s' % s.streak_id if s.streak_id else 'commitment-streak-%s' % s.id }}">
+          <span data-name="{{ s.name }}">{{ s.name }}: {{ s.current_streak }} days (best {{ s.longest_streak }})</span>
           {% if s.streak_id %}
-          <form action="{{ url_for('log_streak', id=s.streak_id) }}" method="post" style="display:inline;">
+          <form action="{{ url_for('log_streak', id=s.streak_id) }}" method="post" style="display:inline;" data-checkoff="streak" data-id="{{ s.streak_id }}">
             <button type="submit" class="btn btn-sm">Log today</button>
           </form>
           {% endif %}
@@ -266,6 +264,85 @@ INDEX_HTML = """
     </div>
     {% endif %}
   </div>
+  <script>
+  // Check-offs go to /api/checkoff in small batches and update the page in place.
+  // Without JS (or on any error) the forms still post and reload as before.
+  (function () {
+    var queue = [], timer = null, url = {{ url_for('api_checkoff')|tojson }}, live = {{ live|tojson }};
+    function setText(li, text) { var span = li && li.querySelector('span[data-name]'); if (span) span.textContent = text; }
+    function apply(changed) {
+      var missing = false;
+      changed.schedule.concat(changed.reminders).forEach(function (row) {
+        var li = document.getElementById((row.completed !== undefined ? 'schedule-' : 'reminder-') + row.id);
+        if (!li) return;
+        if (row.completed || row.done) {
+          li.querySelector('span').className = 'done';
+          var form = li.querySelector('form'); if (form) form.remove();
+        }
+      });
+      changed.counters.forEach(function (c) {
+        var li = document.getElementById('counter-' + c.id);
+        var name = li && li.querySelector('span[data-name]').dataset.name;
+        setText(li, name + ': ' + c.current_value + (c.target_value === null ? '' : ' / ' + c.target_value));
+      });
+      changed.streaks.forEach(function (s) {
+        var li = document.getElementById(s.streak_id ? 'streak-' + s.streak_id : 'commitment-streak-' + s.id);
+        if (!li) { missing = true; return; }
+        setText(li, li.querySelector('span[data-name]').dataset.name + ': ' + s.current_streak + ' days (best ' + s.longest_streak + ')');
+      });
+      if (missing) { location.reload(); return; }
+      fetch({{ url_for('api_message')|tojson }}).then(function (r) { return r.ok ? r.json() : null; }).then(function (j) {
+        if (j) document.querySelector('.message').innerHTML = j.message_html;
+      });
+    }
+    function post(ops) {
+      return fetch(url, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(ops) })
+        .then(function (r) { if (!r.ok) throw new Error(r.status); return r.json(); });
+    }
+    function flush() {
+      var batch = queue; queue = []; timer = null;
+      post(batch.map(function (b) { return b.op; }))
+        .then(function (j) { apply(j.changed); })
+        .catch(function () {
+          // The batch is one transaction, so nothing in it was applied. A lone check-off falls back to
+          // its form; several are retried one at a time (so one bad op can't sink the rest), then reload.
+          if (batch.length === 1) { batch[0].form.submit(); return; }
+          batch.reduce(function (done, b) {
+            return done.then(function () { return post([b.op]).catch(function () {}); });
+          }, Promise.resolve()).then(function () { location.reload(); });
+        });
+    }
+    // Changes from other tabs, devices or a background sync arrive as deltas; rows that appear or
+    // disappear need the server-rendered markup, so those reload the page.
+    if (live && window.EventSource) {
+      var stream = new EventSource({{ url_for('api_stream')|tojson }});
+      stream.addEventListener('delta', function (e) {
+        var d = JSON.parse(e.data), pick = function (s, k) { return (d[s] && d[s][k]) || []; };
+        var structural = ['schedule', 'counters', 'streaks', 'punishment_triggers'].some(function (s) {
+          return pick(s, 'added').length || pick(s, 'removed').length;
+        }) || pick('reminders', 'added').length;
+        if (structural) { location.reload(); return; }
+        apply({
+          schedule: pick('schedule', 'changed'),
+          // The brief only lists undone reminders, so a removed reminder is one that was done
+          reminders: pick('reminders', 'removed').map(function (r) { return { id: r.id, done: 1 }; }),
+          counters: pick('counters', 'changed'),
+          streaks: pick('streaks', 'changed')
+        });
+      });
+      stream.addEventListener('brief', function (e) {
+        if (JSON.parse(e.data).date !== {{ data.date|tojson }}) location.reload();
+      });
+    }
+    document.querySelectorAll('form[data-checkoff]').forEach(function (form) {
+      form.addEventListener('submit', function (e) {
+        e.preventDefault();
+        queue.push({ form: form, op: { type: form.dataset.checkoff, id: Number(form.dataset.id) } });
+        if (!timer) timer = setTimeout(flush, 250);
+      });
+    });
+  })();
+  </script>
 </body>
 </html>
 """
@@ -278,22 +355,7 @@ SYNC_HTML = """
   <meta name="viewport" content="width=device-width, initial-scale=1">
   <title>Sync — Good Girl Assistant</title>
   <link href="https://fonts.googleapis.com/css2?family=DM+Serif+Display&family=JetBrains+Mono:wght@400;500&display=swap" rel="stylesheet">
-  <style>
-    :root { --bg: #0f0e14; --surface: #1a1922; --border: #2d2a3a; --text: #e8e4ef; --muted: #8b8499; --accent: #c49ae8; --success: #7dd3a3; }
-    * { box-sizing: border-box; }
-    body { font-family: 'JetBrains Mono', monospace; background: var(--bg); color: var(--text); margin: 0; min-height: 100vh; padding: 1.5rem; }
-    .container { max-width: 520px; margin: 0 auto; }
-    h1 { font-family: 'DM Serif Display', serif; color: var(--accent); font-size: 1.5rem; }
-    a { color: var(--accent); }
-    .card { background: var(--surface); border: 1px solid var(--border); border-radius: 10px; padding: 1.25rem; margin: 1rem 0; }
-    .btn { display: inline-block; padding: 0.5rem 1rem; background: var(--accent); color: var(--bg); border: none; border-radius: 6px; cursor: pointer; font-family: inherit; font-size: 0.9rem; text-decoration: none; }
-    .btn:hover { opacity: 0.9; }
-    .btn.secondary { background: transparent; color: var(--accent); border: 1px solid var(--border); }
-    label { display: block; margin-bottom: 0.25rem; color: var(--muted); font-size: 0.85rem; }
-    input { background: var(--bg); border: 1px solid var(--border); color: var(--text); padding: 0.5rem; border-radius: 6px; font-family: inherit; width: 100%; margin-bottom: 1rem; }
-    .result { font-size: 0.9rem; margin-top: 1rem; }
-    .err { color: #e07a7a; }
-  </style>
+  <link rel="stylesheet" href="{{ asset_url('css/sync.css') }}">
 </head>
 <body>
   <div class="container">
@@ -356,21 +418,7 @@ IMPORT_HTML = """
   <meta name="viewport" content="width=device-width, initial-scale=1">
   <title>Import — Good Girl Assistant</title>
   <link href="https://fonts.googleapis.com/css2?family=DM+Serif+Display&family=JetBrains+Mono:wght@400;500&display=swap" rel="stylesheet">
-  <style>
-    :root { --bg: #0f0e14; --surface: #1a1922; --border: #2d2a3a; --text: #e8e4ef; --muted: #8b8499; --accent: #c49ae8; }
-    * { box-sizing: border-box; }
-    body { font-family: 'JetBrains Mono', monospace; background: var(--bg); color: var(--text); margin: 0; min-height: 100vh; padding: 1.5rem; }
-    .container { max-width: 640px; margin: 0 auto; }
-    h1 { font-family: 'DM Serif Display', serif; color: var(--accent); font-size: 1.5rem; }
-    a { color: var(--accent); }
-    .card { background: var(--surface); border: 1px solid var(--border); border-radius: 10px; padding: 1.25rem; margin: 1rem 0; }
-    .btn { display: inline-block; padding: 0.5rem 1rem; background: var(--accent); color: var(--bg); border: none; border-radius: 6px; cursor: pointer; font-family: inherit; font-size: 0.9rem; text-decoration: none; }
-    .btn:hover { opacity: 0.9; }
-    .btn.secondary { background: transparent; color: var(--accent); border: 1px solid var(--border); margin-top: 0.5rem; }
-    label { display: block; margin-bottom: 0.25rem; color: var(--muted); font-size: 0.85rem; }
-    textarea { background: var(--bg); border: 1px solid var(--border); color: var(--text); padding: 0.5rem; border-radius: 6px; font-family: inherit; width: 100%; min-height: 160px; margin-bottom: 1rem; resize: vertical; }
-    .result { font-size: 0.9rem; margin-top: 1rem; color: var(--muted); }
-  </style>
+  <link rel="stylesheet" href="{{ asset_url('css/import.css') }}">
 </head>
 <body>
   <div class="container">
@@ -402,33 +450,7 @@ MANAGE_HTML = """
   <link rel="preconnect" href="https://fonts.googleapis.com">
   <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
   <link href="https://fonts.googleapis.com/css2?family=DM+Serif+Display&family=JetBrains+Mono:wght@400;500&display=swap" rel="stylesheet">
-  <style>
-    :root { --bg: #0f0e14; --surface: #1a1922; --border: #2d2a3a; --text: #e8e4ef; --muted: #8b8499; --accent: #c49ae8; --accent-dim: #7b5a9e; --success: #7dd3a3; }
-    * { box-sizing: border-box; }
-    body { font-family: 'JetBrains Mono', monospace; background: var(--bg); color: var(--text); margin: 0; min-height: 100vh; line-height: 1.5; }
-    .container { max-width: 720px; margin: 0 auto; padding: 1.5rem; }
-    h1 { font-family: 'DM Serif Display', serif; font-size: 1.75rem; color: var(--accent); margin-bottom: 0.5rem; }
-    .sub { color: var(--muted); font-size: 0.85rem; margin-bottom: 1rem; }
-    nav { display: flex; gap: 0.75rem; margin-bottom: 1.5rem; flex-wrap: wrap; }
-    nav a, .btn { color: var(--accent); text-decoration: none; padding: 0.4rem 0.8rem; border: 1px solid var(--border); border-radius: 6px; font-size: 0.85rem; background: var(--surface); cursor: pointer; font-family: inherit; }
-    nav a:hover, .btn:hover { border-color: var(--accent-dim); background: #252330; }
-    .card { background: var(--surface); border: 1px solid var(--border); border-radius: 10px; padding: 1.25rem; margin-bottom: 1rem; }
-    .card h2 { font-size: 1rem; color: var(--muted); margin: 0 0 0.75rem; text-transform: uppercase; letter-spacing: 0.05em; }
-    .card ul { margin: 0; padding: 0; list-style: none; }
-    .card li { display: flex; align-items: center; justify-content: space-between; gap: 0.5rem; padding: 0.6rem 0; border-bottom: 1px solid var(--border); flex-wrap: wrap; }
-    .card li:last-child { border-bottom: none; }
-    .btn-sm { padding: 0.25rem 0.5rem; font-size: 0.75rem; }
-    .commitment-text { flex: 1; min-width: 200px; font-size: 0.9rem; }
-    .meta { font-size: 0.75rem; color: var(--muted); }
-    .status-active { color: var(--success); }
-    .status-rejected { text-decoration: line-through; color: var(--muted); }
-    .filters { display: flex; align-items: center; gap: 0.5rem; margin-bottom: 1rem; flex-wrap: wrap; }
-    .filters label { font-size: 0.85rem; color: var(--muted); }
-    .filters select { background: var(--bg); border: 1px solid var(--border); color: var(--text); padding: 0.35rem 0.5rem; border-radius: 6px; font-family: inherit; }
-    .bulk-actions { display: flex; align-items: center; gap: 0.75rem; margin-bottom: 0.75rem; flex-wrap: wrap; }
-    .bulk-actions .select-all { font-size: 0.85rem; cursor: pointer; }
-    .row-select { flex-shrink: 0; cursor: pointer; }
-  </style>
+  <link rel="stylesheet" href="{{ asset_url('css/manage.css') }}">
 </head>
 <body>
   <div class="container">
@@ -443,6 +465,7 @@ MANAGE_HTML = """
     <div class="card">
       <h2>All commitments</h2>
       <form method="get" action="{{ url_for('manage_page') }}" class="filters">
+        {% if page_limit %}<input type="hidden" name="limit" value="{{ page_limit }}">{% endif %}
         <label>Source:</label>
         <select name="source" onchange="this.form.submit()">
           <option value="all" {{ 'selected' if source == 'all' else '' }}>All</option>
@@ -456,14 +479,37 @@ MANAGE_HTML = """
           <option value="rejected" {{ 'selected' if status == 'rejected' else '' }}>Excluded</option>
           <option value="pending" {{ 'selected' if status == 'pending' else '' }}>Pending</option>
         </select>
-        {% if source != 'all' or status != 'all' %}
+        <label>Min confidence:</label>
+        <input type="number" name="min_confidence" min="0" max="1" step="0.05" value="{{ min_confidence if min_confidence is not none else '' }}">
+        <label>Blog:</label>
+        <input type="text" name="blog" value="{{ blog or '' }}" size="12">
+        <label>Older than (days):</label>
+        <input type="number" name="older_than" min="0" value="{{ older_than if older_than is not none else '' }}">
+        <button type="submit" class="btn btn-sm">Filter</button>
+        {% if query %}
         <a href="{{ url_for('manage_page') }}" class="btn btn-sm">Clear filters</a>
         {% endif %}
       </form>
+      {% if query %}
+      <form method="post" action="{{ url_for('manage_bulk') }}" class="bulk-actions">
+        {% for k, v in query.items() %}<input type="hidden" name="{{ k }}" value="{{ v }}">{% endfor %}
+        {% if matching %}
+        <input type="hidden" name="confirm" value="1">
+        <span class="meta">{{ matching.action|capitalize }} {{ matching.count }} commitment(s) matching these filters?</span>
+        <button type="submit" name="action" value="{{ matching.action }}_matching" class="btn btn-sm" {{ 'disabled' if not matching.count }}>{{ matching.action|capitalize }} {{ matching.count }}</button>
+        <a href="{{ url_for('manage_page', **query) }}" class="btn btn-sm">Cancel</a>
+        {% else %}
+        <span class="meta">All matching these filters:</span>
+        <button type="submit" name="action" value="include_matching" class="btn btn-sm">Include all…</button>
+        <button type="submit" name="action" value="exclude_matching" class="btn btn-sm">Exclude all…</button>
+        {% endif %}
+      </form>
+      {% endif %}
       {% if commitments %}
       <form method="post" action="{{ url_for('manage_bulk') }}" id="bulk-form">
-        <input type="hidden" name="source" value="{{ source }}">
-        <input type="hidden" name="status" value="{{ status }}">
+        {% for k, v in query.items() %}<input type="hidden" name="{{ k }}" value="{{ v }}">{% endfor %}
+        {% if before %}<input type="hidden" name="before" value="{{ before }}">{% endif %}
+        {% if page_limit %}<input type="hidden" name="limit" value="{{ page_limit }}">{% endif %}
         <div class="bulk-actions">
           <label class="select-all"><input type="checkbox" id="select-all"> Select all</label>
           <button type="submit" name="action" value="include" class="btn btn-sm">Include selected</button>
@@ -491,8 +537,16 @@ MANAGE_HTML = """
           {% endfor %}
         </ul>
       </form>
+      <div class="bulk-actions" style="margin-top:0.75rem;">
+        {% if before %}
+        <a href="{{ url_for('manage_page', limit=page_limit, **query) }}" class="btn btn-sm">← Newest</a>
+        {% endif %}
+        {% if next_before %}
+        <a href="{{ url_for('manage_page', before=next_before, limit=page_limit, **query) }}" class="btn btn-sm">Older →</a>
+        {% endif %}
+      </div>
       {% else %}
-      <p class="sub">No commitments found. {% if source != 'all' or status != 'all' %}<a href="{{ url_for('manage_page') }}">Clear filters</a> or {% endif %}<a href="{{ url_for('sync_page') }}">Sync Tumblr</a> / <a href="{{ url_for('import_page') }}">Import text</a> to add some.</p>
+      <p class="sub">No commitments found. {% if query %}<a href="{{ url_for('manage_page') }}">Clear filters</a> or {% endif %}<a href="{{ url_for('sync_page') }}">Sync Tumblr</a> / <a href="{{ url_for('import_page') }}">Import text</a> to add some.</p>
       {% endif %}
     </div>
     <p><a href="{{ url_for('index') }}" class="btn secondary">← Back to Today</a></p>
@@ -507,24 +561,99 @@ MANAGE_HTML = """
 """
 
 
+ADMIN_PROFILES_HTML = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <title>Profiles — Good Girl Assistant</title>
+  <link rel="preconnect" href="https://fonts.googleapis.com">
+  <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+  <link href="https://fonts.googleapis.com/css2?family=DM+Serif+Display&family=JetBrains+Mono:wght@400;500&display=swap" rel="stylesheet">
+  <link rel="stylesheet" href="{{ asset_url('css/manage.css') }}">
+</head>
+<body>
+  <div class="container">
+    <h1>Slowest requests</h1>
+    <p class="sub">Profiled requests, slowest first. Sample rate: {{ sample_rate }}; add <code>X-Profile: 1</code> to profile one request.</p>
+    <nav>
+      <a href="{{ url_for('index') }}">Today</a>
+      <a href="{{ url_for('manage_page') }}">Manage</a>
+      <a href="{{ url_for('admin_profiles', format='json') }}">JSON</a>
+    </nav>
+    <div class="card">
+      {% if not admin %}
+      <h2>Admin token</h2>
+      {% if bad_token %}<p class="meta">That token is not right.</p>{% endif %}
+      <form method="post" action="{{ url_for('admin_profiles') }}" class="filters">
+        <input type="password" name="token" autocomplete="current-password">
+        <button type="submit" class="btn btn-sm">Sign in</button>
+      </form>
+      {% elif profiles %}
+      <table style="width:100%;border-collapse:collapse;font-size:0.8rem;">
+        <tr class="meta" style="text-align:left;"><th>Seconds</th><th>Request</th><th>Status</th><th>Top function</th><th>Files</th></tr>
+        {% for p in profiles %}
+        <tr style="border-top:1px solid var(--border);vertical-align:top;">
+          <td>{{ '%.3f' % (p.seconds or 0) }}</td>
+          <td>{{ p.method or '' }} {{ p.path or p.label }}<br><span class="meta">{{ p.started_at }}{% if p.route %} · {{ p.route }}{% endif %}</span></td>
+          <td>{{ p.status or '' }}</td>
+          <td>{% if p.top %}{{ p.top[0].function }}<br><span class="meta">{{ '%.3f' % p.top[0].tottime }} s own time</span>{% endif %}</td>
+          <td><a href="{{ url_for('admin_profile_file', name=p.name ~ '.prof') }}">.prof</a> <a href="{{ url_for('admin_profile_file', name=p.name ~ '.collapsed') }}">.collapsed</a></td>
+        </tr>
+        {% endfor %}
+      </table>
+      {% else %}
+      <p class="sub">No profiles captured yet.</p>
+      {% endif %}
+    </div>
+  </div>
+</body>
+</html>
+"""
+
+
+def _brief(date_str=None, schedule_after: int = 0) -> dict:
+    """Brief memoized on flask.g (and in the cross-request cache), so one request builds each day's brief at most once."""
+    date_str = date_str or today_str()
+    briefs = g.setdefault("briefs", {})
+    if (date_str, schedule_after) not in briefs:
+        briefs[date_str, schedule_after] = cached_brief(date_str, schedule_after)
+    return briefs[date_str, schedule_after]
+
+
 def _markdown_to_html(text: str) -> str:
-    """Minimal: **bold** -> <strong>."""
-    return re.sub(r"\*\*([^*]+)\*\*", r"<strong>\1</strong>", text)
+    """Minimal: escape, then **bold** -> <strong>."""
+    return re.sub(r"\*\*([^*]+)\*\*", r"<strong>\1</strong>", str(escape(text)))
+
+# Compiled once at startup instead of re-parsing the source on every request
+INDEX_TEMPLATE = app.jinja_env.from_string(INDEX_HTML)
+SYNC_TEMPLATE = app.jinja_env.from_string(SYNC_HTML)
+IMPORT_TEMPLATE = app.jinja_env.from_string(IMPORT_HTML)
+MANAGE_TEMPLATE = app.jinja_env.from_string(MANAGE_HTML)
+ADMIN_PROFILES_TEMPLATE = app.jinja_env.from_string(ADMIN_PROFILES_HTML)
+
+
+@app.route("/assets/<path:name>")
+def asset(name):
+    """Fingerprinted static files (see assets.py): gzip when accepted, cached for a year."""
+    return serve_asset(name)
 
 
 @app.route("/")
 def index():
-    data = get_today_brief()
-    message = build_assistant_message()
+    data = _brief(schedule_after=request.args.get("schedule_after", 0, type=int))
+    message = cached_message(data["date"])
     message_html = _markdown_to_html(message)
     pending = get_pending_commitments()
     generate_error = request.args.get("generate_error")
-    return render_template_string(
-        INDEX_HTML,
+    return render_template(
+        INDEX_TEMPLATE,
         data=data,
         message=message_html,
         pending=pending,
         generate_error=generate_error,
+        live=app.config["LIVE_UPDATES"],
     )
 
 
@@ -533,8 +662,9 @@ def tumblr_connect():
     """Start Tumblr OAuth: redirect user to Tumblr to authorize, then callback saves token."""
     if not tumblr_consumer_configured():
         return redirect(url_for("sync_page"))
-    # Reuse stored tokens so we don't burn OAuth request limit
-    if tumblr_configured():
+    # Reuse this browser's stored tokens so we don't burn OAuth request limit. Tokens in the shared
+    # database (older single-user installs) must not stop a new visitor getting their own.
+    if session.get("tumblr_user") and tumblr_configured():
         return redirect(url_for("sync_page", already_signed_in="1"))
     try:
         from requests_oauthlib import OAuth1Session
@@ -548,9 +678,9 @@ def tumblr_connect():
             client_secret=TUMBLR_CONSUMER_SECRET,
             callback_uri=callback_uri,
         )
-        oauth.fetch_request_token("https://www.tumblr.com/oauth/request_token")
+        request_token = oauth.fetch_request_token("https://www.tumblr.com/oauth/request_token")
         authorization_url = oauth.authorization_url("https://www.tumblr.com/oauth/authorize")
-        session["tumblr_request_token"] = (oauth.token, oauth.token_secret)
+        session["tumblr_request_token"] = (request_token["oauth_token"], request_token["oauth_token_secret"])
         return redirect(authorization_url)
     except Exception as e:
         import traceback
@@ -578,12 +708,22 @@ def tumblr_callback():
         verifier=oauth_verifier,
     )
     try:
-        oauth.fetch_access_token("https://www.tumblr.com/oauth/access_token")
+        access_token = oauth.fetch_access_token("https://www.tumblr.com/oauth/access_token")
     except Exception:
         return redirect(url_for("sync_page", tumblr_error="1"))
     session.pop("tumblr_request_token", None)
-    set_setting("tumblr_oauth_token", oauth.token)
-    set_setting("tumblr_oauth_secret", oauth.token_secret)
+    token, token_secret = access_token["oauth_token"], access_token["oauth_token_secret"]
+    from tumblr_client import get_user_name
+    user = get_user_name(token, token_secret)
+    if not user:
+        # Without a user name there is no per-user database; never put the tokens in the shared one
+        return redirect(url_for("sync_page", tumblr_error="1"))
+    # From here on this browser reads and writes the user's own database
+    session["tumblr_user"] = user
+    reset_db(g.pop("db_token"))
+    g.db_token = use_user(user)
+    set_setting("tumblr_oauth_token", token)
+    set_setting("tumblr_oauth_secret", token_secret)
     return redirect(url_for("sync_page", tumblr_connected="1"))
 
 
@@ -618,8 +758,8 @@ def sync_page():
     already_signed_in = request.args.get("already_signed_in")
     tumblr_callback_url = url_for("tumblr_callback", _external=True) if tumblr_consumer_configured() else ""
     tumblr_connect_url = url_for("tumblr_connect", _external=True) if tumblr_consumer_configured() else ""
-    return render_template_string(
-        SYNC_HTML,
+    return render_template(
+        SYNC_TEMPLATE,
         tumblr_configured=tumblr_configured(),
         tumblr_consumer_configured=tumblr_consumer_configured(),
         tumblr_connected=tumblr_connected,
@@ -632,48 +772,156 @@ def sync_page():
     )
 
 
-@app.route("/manage")
-def manage_page():
-    source = request.args.get("source") or "all"
-    status = request.args.get("status") or "all"
+def _manage_args(args, strict: bool = False) -> dict:
+    """Validated Manage filters and keyset cursor from a request's args or form.
+    Unknown values fall back to no filter, or raise ValueError when strict (bulk updates must not widen)."""
+    source = args.get("source") or "all"
+    status = args.get("status") or "all"
     if source not in ("all", "tumblr", "import"):
+        if strict:
+            raise ValueError("source must be all, tumblr or import")
         source = "all"
     if status not in ("all", "active", "rejected", "pending"):
+        if strict:
+            raise ValueError("status must be all, active, rejected or pending")
         status = "all"
-    commitments = get_all_commitments_for_manage(
-        source_filter=source if source != "all" else None,
-        status_filter=status if status != "all" else None,
-    )
-    return render_template_string(
-        MANAGE_HTML,
-        commitments=commitments,
-        source=source,
-        status=status,
+    min_confidence = args.get("min_confidence", type=float)
+    older_than = args.get("older_than", type=int)
+    if strict and args.get("min_confidence") not in (None, "") and min_confidence is None:
+        raise ValueError("min_confidence must be a number")
+    if strict and args.get("older_than") not in (None, "") and (older_than is None or older_than < 0):
+        raise ValueError("older_than must be a number of days")
+    return {
+        "source": source,
+        "status": status,
+        "min_confidence": min_confidence,
+        "blog": (args.get("blog") or "").strip() or None,
+        "older_than": older_than,
+        "before": args.get("before", type=int),
+        "limit": args.get("limit", MANAGE_PAGE_SIZE, type=int),
+    }
+
+
+def _manage_filters(args) -> dict:
+    """commitment_filter_sql kwargs for validated Manage args."""
+    return {
+        "source_filter": args["source"] if args["source"] != "all" else None,
+        "status_filter": args["status"] if args["status"] != "all" else None,
+        "min_confidence": args["min_confidence"],
+        "blog": args["blog"],
+        "older_than_days": args["older_than"],
+    }
+
+
+def _manage_query(args) -> dict:
+    """Query-string args for the active filters (no cursor), for links back to the same view."""
+    query = {k: args[k] for k in ("source", "status") if args[k] != "all"}
+    query.update({k: args[k] for k in ("min_confidence", "blog", "older_than") if args[k] is not None})
+    return query
+
+
+def _manage_page_data(args) -> dict:
+    page = get_commitments_page(before_id=args["before"], limit=args["limit"], **_manage_filters(args))
+    return dict(page, source=args["source"], status=args["status"])
+
+
+@app.route("/manage")
+def manage_page():
+    """Newest commitments first, one page at a time (?before=<id> for older ones)."""
+    args = _manage_args(request.args)
+    page = _manage_page_data(args)
+    query = _manage_query(args)
+    # The "all matching" buttons are only offered once something narrows the list. Their count is a
+    # dry run over every match, so it only runs on the confirm step (?confirm=include|exclude), not per page
+    matching = None
+    action = request.args.get("confirm")
+    if query and action in _BULK_STATUS:
+        count = set_commitment_status_matching(_BULK_STATUS[action], _manage_filters(args), dry_run=True)
+        matching = {"action": action, "count": count}
+    return render_template(
+        MANAGE_TEMPLATE,
+        commitments=page["commitments"],
+        next_before=page["next_before"],
+        before=args["before"],
+        limit=args["limit"],
+        # Carried in page links only when it isn't the default
+        page_limit=args["limit"] if args["limit"] != MANAGE_PAGE_SIZE else None,
+        query=query,
+        matching=matching,
+        **{k: args[k] for k in ("source", "status", "min_confidence", "blog", "older_than")},
     )
 
 
+@app.route("/api/commitments")
+def api_commitments():
+    """JSON Manage list: ?source=tumblr|import&status=active|rejected|pending&min_confidence=&blog=&older_than=<days>
+    &before=<id>&limit=N. Pass next_before back as ?before= for the next page."""
+    return jsonify(_manage_page_data(_manage_args(request.args)))
+
+
+_BULK_STATUS = {"include": "active", "exclude": "rejected"}
+
+
+# Filters accepted by /api/commitments/bulk (the /manage query args, less the cursor and page size)
+_BULK_FILTER_KEYS = {"source", "status", "min_confidence", "blog", "older_than"}
+
+
+@app.route("/api/commitments/bulk", methods=["POST"])
+def api_commitments_bulk():
+    """Include/exclude by filter in one UPDATE: {"action": "include"|"exclude", "filters": {source, status,
+    min_confidence, blog, older_than}, "dry_run": true} -> {"count"}. {"ids": [...]} targets explicit rows instead."""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or payload.get("action") not in _BULK_STATUS:
+        return jsonify({"error": "action must be include or exclude"}), 400
+    status = _BULK_STATUS[payload["action"]]
+    dry_run = bool(payload.get("dry_run"))
+    if "ids" in payload:
+        ids = payload["ids"]
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return jsonify({"error": "ids must be a list of integers"}), 400
+        if dry_run:
+            return jsonify({"error": "dry_run applies to filters, not ids"}), 400
+        return jsonify({"action": payload["action"], "dry_run": False, "count": set_commitment_status_bulk(ids, status)})
+    filters = payload.get("filters") or {}
+    if not isinstance(filters, dict):
+        return jsonify({"error": "filters must be an object"}), 400
+    unknown = sorted(set(filters) - _BULK_FILTER_KEYS)
+    if unknown:
+        return jsonify({"error": f"unknown filter(s): {', '.join(unknown)}"}), 400
+    try:
+        args = _manage_args(MultiDict({k: str(v) for k, v in filters.items() if v is not None}), strict=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # Same guard as /manage/bulk: an update must be narrowed by at least one filter
+    if not dry_run and not _manage_query(args):
+        return jsonify({"error": "filters must narrow the update (or use dry_run to count everything)"}), 400
+    count = set_commitment_status_matching(status, _manage_filters(args), dry_run=dry_run)
+    return jsonify({"action": payload["action"], "dry_run": dry_run, "count": count})
+
+
 @app.route("/manage/bulk", methods=["POST"])
 def manage_bulk():
     action = request.form.get("action")
-    ids = request.form.getlist("ids")
-    source = request.form.get("source") or "all"
-    status = request.form.get("status") or "all"
-    if action in ("include", "exclude") and ids:
+    try:
+        args = _manage_args(request.form, strict=True)
+    except ValueError:
+        return redirect(url_for("manage_page"))
+    if action in ("include", "exclude"):
         id_list = []
-        for i in ids:
+        for i in request.form.getlist("ids"):
             try:
                 id_list.append(int(i))
             except ValueError:
                 pass
         if id_list:
-            set_commitment_status_bulk(id_list, "active" if action == "include" else "rejected")
-    params = []
-    if source != "all":
-        params.append(f"source={source}")
-    if status != "all":
-        params.append(f"status={status}")
-    redirect_url = url_for("manage_page") + ("?" + "&".join(params) if params else "")
-    return redirect(redirect_url)
+            set_commitment_status_bulk(id_list, _BULK_STATUS[action])
+    elif action in ("include_matching", "exclude_matching") and _manage_query(args):
+        if request.form.get("confirm") != "1":
+            # First click: back to the list with the count to confirm
+            return redirect(url_for("manage_page", confirm=action.split("_")[0], **_manage_query(args)))
+        set_commitment_status_matching(_BULK_STATUS[action.split("_")[0]], _manage_filters(args))
+    limit = args["limit"] if args["limit"] != MANAGE_PAGE_SIZE else None
+    return redirect(url_for("manage_page", before=args["before"], limit=limit, **_manage_query(args)))
 
 
 @app.route("/import", methods=["GET", "POST"])
@@ -684,25 +932,118 @@ def import_page():
         text = (request.form.get("text") or "").strip()
         if text:
             imported = import_from_text(text, "pasted")
-    return render_template_string(
-        IMPORT_HTML,
+    return render_template(
+        IMPORT_TEMPLATE,
         text=text,
         imported=imported,
     )
 
 
+def _conditional_json(date_str: str, build):
+    """JSON response with a strong ETag from the data generation; answers If-None-Match with 304
+    before `build` runs, so unchanged polls never touch the brief tables."""
+    raw = (
+        f"{current_db_path()}|{data_generation()}|{request.path}|{request.args.get('include', '')}"
+        f"|{request.args.get('schedule_after', '')}|{date_str}|{today_str()}"
+    )
+    etag = hashlib.sha1(raw.encode()).hexdigest()[:24]
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    else:
+        resp = jsonify(build())
+    resp.set_etag(etag)
+    # Clients may keep the body but must revalidate (cheaply, via the ETag) before reusing it
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
 @app.route("/api/today")
 def api_today():
-    return jsonify(get_today_brief(request.args.get("date")))
+    """Brief for a day. ?include=message adds the assistant message, saving a second request.
+    ?schedule_after=<schedule_next> fetches the next page of a long schedule."""
+    date_str = request.args.get("date") or today_str()
+
+    def build():
+        data = _brief(date_str, request.args.get("schedule_after", 0, type=int))
+        if request.args.get("include") == "message":
+            data = dict(data, **_message_payload(cached_message(date_str)))
+        return data
+
+    return _conditional_json(date_str, build)
+
+
+@app.route("/api/range")
+def api_range():
+    """Calendar view data for a date range in one request (instead of one /api/today per day)."""
+    from_date = request.args.get("from") or today_str()
+    to_date = request.args.get("to") or from_date
+    try:
+        date_range(from_date, to_date, MAX_RANGE_DAYS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _conditional_json(f"{from_date}..{to_date}", lambda: cached_range(from_date, to_date))
 
 
 @app.route("/api/generate", methods=["POST"])
 def api_generate():
+    from_date = request.args.get("from") or request.form.get("from")
+    to_date = request.args.get("to") or request.form.get("to")
+    if from_date or to_date:
+        from_date = from_date or to_date
+        to_date = to_date or from_date
+        try:
+            days = generate_schedule_for_range(from_date, to_date)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"from": from_date, "to": to_date, "inserted": sum(days.values()), "days": days})
     date_str = request.args.get("date") or request.form.get("date") or today_str()
-    inserted = generate_schedule_for_date(date_str)
+    try:
+        inserted = generate_schedule_for_date(date_str)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify({"date": date_str, "inserted": inserted})
 
 
+@app.route("/api/search")
+def api_search():
+    """Ranked full-text search: ?q=words&kind=all|posts|commitments&limit=20. Matches come back in <mark>."""
+    try:
+        return jsonify(
+            search(
+                request.args.get("q") or "",
+                kind=request.args.get("kind") or "all",
+                limit=request.args.get("limit", SEARCH_LIMIT, type=int),
+            )
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/api/history")
+def api_history():
+    to_date = request.args.get("to") or today_str()
+    from_date = request.args.get("from") or to_date
+    try:
+        days = get_completion_history(from_date, to_date)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"from": from_date, "to": to_date, "days": days})
+
+
+@app.route("/api/heatmap")
+def api_heatmap():
+    """Year view: completion rate per day and per commitment. ?year= (default this year), ?commitment_id= to narrow."""
+    try:
+        year = int(request.args.get("year") or today_str()[:4])
+        commitment_id = request.args.get("commitment_id")
+        commitment_id = int(commitment_id) if commitment_id else None
+    except ValueError:
+        return jsonify({"error": "year and commitment_id must be integers"}), 400
+    if not 1 <= year <= 9999:
+        return jsonify({"error": "year out of range"}), 400
+    return _conditional_json(f"{year}:{commitment_id}", lambda: cached_heatmap(year, commitment_id))
+
+
 @app.route("/generate", methods=["POST"])
 def generate_route():
     date_str = request.form.get("date") or today_str()
@@ -713,21 +1054,120 @@ def generate_route():
         return redirect(url_for("index", generate_error="1"))
 
 
+def _back_to_manage_or_index() -> str:
+    """The Manage page the click came from (same filters and page), else Today."""
+    ref = urlsplit(request.referrer or "")
+    if ref.path.endswith("/manage"):
+        return url_for("manage_page") + (f"?{ref.query}" if ref.query else "")
+    return url_for("index")
+
+
 @app.route("/commitment/<int:id>/approve", methods=["POST"])
 def commitment_approve(id):
     set_commitment_status(id, "active")
-    return redirect(url_for("manage_page") if request.referrer and "/manage" in request.referrer else url_for("index"))
+    return redirect(_back_to_manage_or_index())
 
 
 @app.route("/commitment/<int:id>/reject", methods=["POST"])
 def commitment_reject(id):
     set_commitment_status(id, "rejected")
-    return redirect(url_for("manage_page") if request.referrer and "/manage" in request.referrer else url_for("index"))
+    return redirect(_back_to_manage_or_index())
+
+
+def _message_payload(message: str) -> dict:
+    """The message as plain text and as the HTML the Today page shows."""
+    return {"message": message, "message_html": _markdown_to_html(message)}
 
 
 @app.route("/api/assistant-message")
 def api_message():
-    return jsonify({"message": build_assistant_message(request.args.get("date"))})
+    date_str = request.args.get("date") or today_str()
+    return _conditional_json(date_str, lambda: _message_payload(cached_message(date_str)))
+
+
+# Comment line sent on idle streams so proxies don't drop them
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route("/api/stream")
+def api_stream():
+    """Server-sent events: a full `brief` first, then a `delta` (added/changed/removed rows per section)
+    whenever the data changes. Without ?date= it follows today and sends a fresh `brief` after midnight.
+    Off unless LIVE_UPDATES is set: an open stream holds its worker thread, which freezes a sync worker."""
+    if not app.config["LIVE_UPDATES"]:
+        return jsonify({"error": "Live updates are off (set LIVE_UPDATES=1 and serve with threaded workers)"}), 404
+    fixed_date = request.args.get("date")
+    path = current_db_path()
+
+    def events():
+        # Runs after the request context is gone, so pin this user's database explicitly
+        with using_db(path):
+            stamp = notifier.subscribe(path)
+            try:
+                brief = cached_brief(fixed_date or today_str())
+                yield "retry: 3000\n" + _sse("brief", brief)
+                while True:
+                    new_stamp = notifier.wait(path, stamp, STREAM_KEEPALIVE_SECONDS)
+                    date_str = fixed_date or today_str()
+                    if new_stamp == stamp and date_str == brief["date"]:
+                        yield ": keepalive\n\n"
+                        continue
+                    stamp = new_stamp
+                    new = cached_brief(date_str)
+                    if new["date"] != brief["date"]:
+                        yield _sse("brief", new)
+                    else:
+                        delta = brief_delta(brief, new)
+                        if delta:
+                            yield _sse("delta", delta)
+                    brief = new
+            finally:
+                notifier.unsubscribe(path)
+
+    resp = Response(events(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"  # nginx: don't buffer the stream
+    return resp
+
+
+@app.route("/api/export")
+def api_export():
+    """The whole database as NDJSON (format in transfer.py), streamed from one snapshot."""
+    path = current_db_path()
+
+    def lines():
+        with using_db(path):
+            yield from export_ndjson()
+
+    resp = Response(lines(), mimetype="application/x-ndjson")
+    resp.headers["Content-Disposition"] = f'attachment; filename="export-{today_str()}.ndjson"'
+    return resp
+
+
+@app.route("/api/import", methods=["POST"])
+def api_import():
+    """Load an /api/export body into this database, reading it line by line. Returns rows added per table."""
+    try:
+        counts = import_ndjson(request.stream)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"imported": counts})
+
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint for this worker."""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route("/api/cache-stats")
+def api_cache_stats():
+    """Hit/miss counters for this worker's brief and message cache."""
+    return jsonify(brief_cache.stats())
 
 
 @app.route("/api/sync", methods=["POST"])
@@ -737,6 +1177,17 @@ def api_sync():
     return jsonify(result)
 
 
+@app.route("/api/checkoff", methods=["POST"])
+def api_checkoff():
+    """Apply a JSON list of check-offs in one transaction; returns only the rows that changed."""
+    ops = request.get_json(silent=True)
+    try:
+        result = apply_checkoffs(ops)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+
 @app.route("/schedule/<int:id>/done", methods=["POST"])
 def mark_schedule_done_route(id):
     mark_schedule_done(id)
@@ -761,5 +1212,68 @@ def log_streak(id):
     return redirect(url_for("index"))
 
 
+def _admin_session_tag() -> str:
+    # Stored in the session instead of the token itself; changing ADMIN_TOKEN signs everyone out
+    return hashlib.sha256(f"admin|{ADMIN_TOKEN}".encode()).hexdigest()[:32]
+
+
+def _is_admin() -> bool:
+    """True when ADMIN_TOKEN is set and the request carries it in X-Admin-Token, or the browser
+    session signed in with it on /admin/profiles."""
+    if not ADMIN_TOKEN:
+        return False
+    supplied = request.headers.get("X-Admin-Token") or ""
+    if hmac.compare_digest(ADMIN_TOKEN, supplied):
+        return True
+    return hmac.compare_digest(session.get("admin") or "", _admin_session_tag())
+
+
+@app.route("/admin/profiles", methods=["GET", "POST"])
+def admin_profiles():
+    """Captured request profiles, slowest first (?limit=N), as an HTML table or with ?format=json.
+    Fetch files from /admin/profiles/<name>.prof|.collapsed. POST token=... signs a browser in."""
+    bad_token = False
+    if request.method == "POST":
+        supplied = request.form.get("token") or ""
+        if ADMIN_TOKEN and hmac.compare_digest(ADMIN_TOKEN, supplied):
+            session["admin"] = _admin_session_tag()
+            return redirect(url_for("admin_profiles"))
+        bad_token = True
+    admin = _is_admin()
+    if request.args.get("format") == "json":
+        if not admin:
+            return jsonify({"error": "forbidden"}), 403
+        return jsonify(
+            {"sample_rate": PROFILE_SAMPLE_RATE, "profiles": list_profiles(limit=request.args.get("limit", type=int))}
+        )
+    profiles = list_profiles(limit=request.args.get("limit", 100, type=int)) if admin else []
+    html = render_template(
+        ADMIN_PROFILES_TEMPLATE, admin=admin, bad_token=bad_token, profiles=profiles, sample_rate=PROFILE_SAMPLE_RATE
+    )
+    return html, 200 if admin else 403
+
+
+@app.route("/admin/profiles/<name>")
+def admin_profile_file(name):
+    if not _is_admin():
+        return jsonify({"error": "forbidden"}), 403
+    if not re.fullmatch(r"[\w-]+\.(prof|collapsed|json)", name):
+        return jsonify({"error": "not found"}), 404
+    return send_from_directory(PROFILE_DIR, name, as_attachment=name.endswith(".prof"))
+
+
+@app.route("/admin/backup", methods=["GET", "POST"])
+def admin_backup():
+    """POST starts an online backup of every database in the background; GET lists snapshots."""
+    if not _is_admin():
+        return jsonify({"error": "forbidden"}), 403
+    if request.method == "POST":
+        started = start_backup(keep=request.args.get("keep", DEFAULT_KEEP, type=int))
+        if started is None:
+            return jsonify({"started": False, "running": True}), 409
+        return jsonify({"started": True, "running": True}), 202
+    return jsonify({"running": backup_running(), "backups": list_backups()})
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,121 @@
+"""Archive old schedule_items / activity_log rows, keeping compact per-day summaries.
+
+Run periodically (e.g. daily cron): python archive.py --retention-days 90
+"""
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from db import get_conn, init_db, now_iso, bump_data_generation
+
+# Days of full-detail history kept in the hot tables
+DEFAULT_RETENTION_DAYS = 90
+
+
+def archive_history(retention_days: int = DEFAULT_RETENTION_DAYS, today: Optional[date] = None) -> dict:
+    """Delete schedule_items and activity_log rows dated before today - retention_days, in one transaction.
+    Schedule totals stay in schedule_daily_summary; activity rows are folded into activity_daily_summary. Templates (date = '') are never touched.
+    Returns {cutoff, schedule_rows, activity_rows}."""
+    if retention_days < 0:
+        raise ValueError("retention_days must be >= 0")
+    cutoff = ((today or date.today()) - timedelta(days=retention_days)).isoformat()
+    archived_at = now_iso()
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        # schedule_daily_summary already counts these rows (it is maintained live); just stamp it
+        cur.execute(
+            "UPDATE schedule_daily_summary SET archived_at = ? WHERE date < ? AND archived_at IS NULL",
+            (archived_at, cutoff),
+        )
+        cur.execute("DELETE FROM schedule_items WHERE date != '' AND date < ?", (cutoff,))
+        schedule_rows = cur.rowcount
+        cur.execute(
+            """INSERT INTO activity_daily_summary
+                   (date, commitment_id, action_type, target_id, events, amount, archived_at)
+               SELECT date, COALESCE(commitment_id, 0), COALESCE(action_type, ''), COALESCE(target_id, 0),
+                      COUNT(*), SUM(COALESCE(amount, 1)), ?
+               FROM activity_log WHERE date < ?
+               GROUP BY date, COALESCE(commitment_id, 0), COALESCE(action_type, ''), COALESCE(target_id, 0)
+               ON CONFLICT(date, commitment_id, action_type, target_id) DO UPDATE SET
+                   events = events + excluded.events,
+                   amount = amount + excluded.amount,
+                   archived_at = excluded.archived_at""",
+            (archived_at, cutoff),
+        )
+        cur.execute("DELETE FROM activity_log WHERE date < ?", (cutoff,))
+        activity_rows = cur.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    if schedule_rows or activity_rows:
+        bump_data_generation()
+    return {"cutoff": cutoff, "schedule_rows": schedule_rows, "activity_rows": activity_rows}
+
+
+def get_completion_history(from_date: str, to_date: str) -> list[dict]:
+    """Per-day {date, total_items, completed_items} over live and archived days, oldest first."""
+    datetime.strptime(from_date, "%Y-%m-%d")
+    datetime.strptime(to_date, "%Y-%m-%d")
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        """SELECT date, SUM(total_items) AS total_items, SUM(completed_items) AS completed_items
+           FROM schedule_daily_summary WHERE date BETWEEN ? AND ? GROUP BY date ORDER BY date""",
+        (from_date, to_date),
+    )
+    rows = [dict(r) for r in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+def get_heatmap(year: int, commitment_id: Optional[int] = None) -> dict:
+    """Completion rate per day for a calendar year, overall and per commitment, from schedule_daily_summary
+    alone. Days without scheduled items are omitted. streak is the commitment's streak after that day, if
+    the day was completed."""
+    conn = get_conn()
+    cur = conn.cursor()
+    sql = """SELECT date, commitment_id, total_items, completed_items, current_streak
+             FROM schedule_daily_summary WHERE date BETWEEN ? AND ? AND total_items > 0"""
+    params: list = [f"{year:04d}-01-01", f"{year:04d}-12-31"]
+    if commitment_id is not None:
+        sql += " AND commitment_id = ?"
+        params.append(commitment_id)
+    cur.execute(sql + " ORDER BY date, commitment_id", params)
+    rows = cur.fetchall()
+    conn.close()
+    days: dict = {}
+    commitments: dict = {}
+    for d, cid, total, completed, streak in rows:
+        completed = completed or 0
+        day = days.setdefault(d, {"date": d, "total": 0, "completed": 0})
+        day["total"] += total
+        day["completed"] += completed
+        commitments.setdefault(cid, []).append(
+            {"date": d, "total": total, "completed": completed, "rate": round(completed / total, 3), "streak": streak}
+        )
+    for day in days.values():
+        day["rate"] = round(day["completed"] / day["total"], 3)
+    return {
+        "year": year,
+        "days": list(days.values()),
+        "commitments": [{"commitment_id": cid, "days": cdays} for cid, cdays in commitments.items()],
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--retention-days", type=int, default=DEFAULT_RETENTION_DAYS)
+    args = ap.parse_args(argv)
+    init_db()
+    result = archive_history(args.retention_days)
+    print(
+        f"Archived {result['schedule_rows']} schedule row(s) and "
+        f"{result['activity_rows']} activity row(s) dated before {result['cutoff']}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,61 @@
+"""Static assets (static/) served under content-fingerprinted URLs with long cache lifetimes.
+
+Files are read, hashed and gzipped once at startup. Templates link them with asset_url('css/index.css'),
+which yields /assets/css/index.<hash>.css; a changed file gets a new URL, so browsers can cache forever.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+from flask import Response, abort, request, url_for
+
+from config import BASE_DIR
+
+ASSET_DIR = BASE_DIR / "static"
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+_FINGERPRINTED = re.compile(r"^(?P<stem>.+)\.(?P<fp>[0-9a-f]{12})(?P<ext>\.[^./]+)$")
+_assets: dict = {}  # relative name -> (fingerprint, raw bytes, gzipped bytes, mimetype)
+
+
+def load_assets(asset_dir: Path = ASSET_DIR) -> None:
+    _assets.clear()
+    if not asset_dir.is_dir():
+        return
+    for path in sorted(p for p in asset_dir.rglob("*") if p.is_file()):
+        raw = path.read_bytes()
+        name = path.relative_to(asset_dir).as_posix()
+        mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        _assets[name] = (hashlib.sha256(raw).hexdigest()[:12], raw, gzip.compress(raw, 9, mtime=0), mimetype)
+
+
+def asset_url(name: str) -> str:
+    """URL for static/<name> that changes whenever the file's content does."""
+    stem, ext = os.path.splitext(name)
+    return url_for("asset", name=f"{stem}.{_assets[name][0]}{ext}")
+
+
+def serve_asset(name: str) -> Response:
+    match = _FINGERPRINTED.match(name)
+    entry = _assets.get(match["stem"] + match["ext"]) if match else None
+    if entry is None:
+        abort(404)
+    fp, raw, gz, mimetype = entry
+    use_gzip = "gzip" in request.accept_encodings
+    resp = Response(gz if use_gzip else raw, mimetype=mimetype)
+    if use_gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.set_etag(f"{fp}-gz" if use_gzip else fp)  # different bytes, so a different strong tag
+    if fp == match["fp"]:
+        resp.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    else:
+        # A page from before a deploy asked for the old version: serve the current one, but don't pin it
+        resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
+
+
+load_assets()
@@ -1,42 +1,137 @@
 """AI assistant: what to do today, reminders, counters, streaks, punishment triggers."""
+import json
 from datetime import datetime, date
 from typing import Optional
 
-from db import get_conn, now_iso
+from activity import group_commit, write_events
+from db import get_conn, now_iso, bump_data_generation
+from scheduler import next_due_after_done
 from sync import (
-    get_schedule_items_for_date,
-    get_reminders_today,
-    get_counters,
-    get_streaks,
-    get_punishment_triggers,
+    date_range,
+    _add_daily_summary,
+    _fetch_visible,
+    _MAYBE_PAST_EVENT,
+    _schedule_page,
+    _reminders_today,
+    _counters,
+    _streaks,
+    _punishment_triggers,
 )
 
+# Most check-offs accepted in one /api/checkoff request
+MAX_CHECKOFF_BATCH = 500
+# Schedule rows per brief; the rest of a big day is paged with schedule_after
+BRIEF_SCHEDULE_LIMIT = 500
+
 
 def today_str() -> str:
     return date.today().isoformat()
 
 
-def get_today_brief(date_str: Optional[str] = None) -> dict:
-    """Aggregate everything the assistant should show for a day."""
+def get_today_brief(
+    date_str: Optional[str] = None, schedule_after: int = 0, schedule_limit: int = BRIEF_SCHEDULE_LIMIT
+) -> dict:
+    """Aggregate everything the assistant should show for a day, on one connection in one read transaction.
+    The schedule is one page: rows with id > schedule_after, at most schedule_limit of them; schedule_next
+    is the schedule_after for the next page, or None when this page is the last."""
     date_str = date_str or today_str()
-    schedule = get_schedule_items_for_date(date_str)
-    reminders = get_reminders_today()
-    counters = get_counters()
-    streaks = get_streaks()
-    punishments = get_punishment_triggers()
-    return {
-        "date": date_str,
-        "schedule": schedule,
-        "reminders": reminders,
-        "counters": counters,
-        "streaks": streaks,
-        "punishment_triggers": punishments,
-    }
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN")  # all sections see the same snapshot
+        schedule, schedule_next = _schedule_page(cur, date_str, schedule_after, schedule_limit)
+        brief = {
+            "date": date_str,
+            "schedule": schedule,
+            "schedule_next": schedule_next,
+            "reminders": _reminders_today(cur),
+            "counters": _counters(cur),
+            "streaks": _streaks(cur),
+            "punishment_triggers": _punishment_triggers(cur),
+        }
+        conn.commit()
+    finally:
+        conn.close()
+    return brief
+
+
+# Longest span /api/range will return in one response
+MAX_RANGE_DAYS = 366
+
+
+def get_range_brief(from_date: str, to_date: str) -> dict:
+    """Per-day schedule and completion stats for [from_date, to_date], plus reminders, counters, streaks and
+    triggers once. Dated rows come from one range query; each day also lists the daily templates, like
+    get_today_brief. Completion stats come from schedule_daily_summary, so they cover archived days too."""
+    days = {d: {"schedule": [], "total": 0, "completed": 0} for d in date_range(from_date, to_date, MAX_RANGE_DAYS)}
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN")
+        dated = _fetch_visible(
+            cur,
+            f"""SELECT si.id, si.commitment_id, si.date, si.title, si.notes, si.completed, c.raw_text,
+                       {_MAYBE_PAST_EVENT} AS maybe_past_event
+                FROM schedule_items si
+                JOIN commitments c ON c.id = si.commitment_id AND c.status = 'active'
+                WHERE si.date = '' OR si.date BETWEEN ? AND ? ORDER BY si.id""",
+            (from_date, to_date),
+        )
+        cur.execute(
+            """SELECT date, SUM(total_items), SUM(completed_items) FROM schedule_daily_summary
+               WHERE date BETWEEN ? AND ? GROUP BY date""",
+            (from_date, to_date),
+        )
+        totals = cur.fetchall()
+        shared = {
+            "reminders": _reminders_today(cur),
+            "counters": _counters(cur),
+            "streaks": _streaks(cur),
+            "punishment_triggers": _punishment_triggers(cur),
+        }
+        conn.commit()
+    finally:
+        conn.close()
+    templates = [r for r in dated if r["date"] == ""]
+    for r in dated:
+        if r["date"] != "":
+            days[r["date"]]["schedule"].append(r)
+    for d, total, completed in totals:
+        days[d]["total"] = total or 0
+        days[d]["completed"] = completed or 0
+    out_days = []
+    for d, day in days.items():
+        schedule = sorted(day["schedule"] + templates, key=lambda r: r["id"]) if templates else day["schedule"]
+        out_days.append({"date": d, "schedule": schedule, "total": day["total"], "completed": day["completed"]})
+    return {"from": from_date, "to": to_date, "days": out_days, **shared}
+
+
+BRIEF_SECTIONS = ("schedule", "reminders", "counters", "streaks", "punishment_triggers")
 
 
-def build_assistant_message(date_str: Optional[str] = None) -> str:
-    """Build assistant message: what's due today, overdue, streak on the line, punishments, short instructions."""
-    data = get_today_brief(date_str)
+def brief_delta(old: dict, new: dict) -> dict:
+    """Per-section {added, changed, removed} rows between two briefs for the same date; {} when equal.
+    Rows are matched by id (and streak_id, since legacy and commitment streaks share the list)."""
+    delta = {}
+    for section in BRIEF_SECTIONS:
+        before = {(r.get("streak_id"), r["id"]): r for r in old.get(section) or []}
+        after = {(r.get("streak_id"), r["id"]): r for r in new.get(section) or []}
+        changes = {
+            "added": [r for k, r in after.items() if k not in before],
+            "changed": [r for k, r in after.items() if k in before and before[k] != r],
+            "removed": [r for k, r in before.items() if k not in after],
+        }
+        changes = {kind: rows for kind, rows in changes.items() if rows}
+        if changes:
+            delta[section] = changes
+    return delta
+
+
+def build_assistant_message(date_str: Optional[str] = None, data: Optional[dict] = None) -> str:
+    """Build assistant message: what's due today, overdue, streak on the line, punishments, short instructions.
+    Pass `data` (a get_today_brief result) to reuse a brief the caller already has."""
+    if data is None:
+        data = get_today_brief(date_str)
     d = data["date"]
     lines = [f"**Your plan for {d}**", ""]
 
@@ -48,6 +143,8 @@ def build_assistant_message(date_str: Optional[str] = None) -> str:
         lines.append("📋 **Due today**")
         for s in due:
             lines.append(f"  • {s['title']}")
+        if data.get("schedule_next"):
+            lines.append("  • …and more on the Today page")
         lines.append("")
     if done:
         lines.append("✅ **Done**")
@@ -93,23 +190,31 @@ def build_assistant_message(date_str: Optional[str] = None) -> str:
     return "\n".join(lines).strip()
 
 
+def _apply(op, *args) -> bool:
+    """Run one check-off helper and log its events, group-committed with concurrent check-offs."""
+    return group_commit(op, *args)
+
+
 def mark_schedule_done(schedule_item_id: int) -> bool:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT commitment_id FROM schedule_items WHERE id = ?", (schedule_item_id,))
+    return _apply(_mark_schedule_done, schedule_item_id)
+
+
+def _mark_schedule_done(cur, schedule_item_id: int, events: list) -> bool:
+    cur.execute("SELECT commitment_id, date, completed FROM schedule_items WHERE id = ?", (schedule_item_id,))
     row = cur.fetchone()
-    commitment_id = row[0] if row else None
+    if not row or row[2]:
+        return False  # missing, or already done (a double click): no second event in the log
+    commitment_id = row[0]
     cur.execute("UPDATE schedule_items SET completed = 1 WHERE id = ?", (schedule_item_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    if ok and commitment_id is not None:
-        _update_commitment_streak_if_done_today(cur, commitment_id)
-        conn.commit()
-    conn.close()
-    return ok
+    if row[1]:
+        _add_daily_summary(cur, [(row[1], commitment_id or 0, 0, 1)])
+    events.append({"action_type": "schedule_done", "commitment_id": commitment_id, "target_id": schedule_item_id})
+    if commitment_id is not None:
+        _update_commitment_streak_if_done_today(cur, commitment_id, events)
+    return True
 
 
-def _update_commitment_streak_if_done_today(cur, commitment_id: int):
+def _update_commitment_streak_if_done_today(cur, commitment_id: int, events: list):
     """If all of today's schedule items for this commitment are done, update commitment streak."""
     today = today_str()
     cur.execute(
@@ -128,82 +233,166 @@ def _update_commitment_streak_if_done_today(cur, commitment_id: int):
     current, best, last = row[0] or 0, row[1] or 0, row[2]
     if last == today:
         return
-    if last:
-        try:
-            last_d = datetime.strptime(last[:10], "%Y-%m-%d").date()
-            today_d = date.today()
-            if (today_d - last_d).days == 1:
-                current += 1
-            else:
-                current = 1
-        except Exception:
-            current = 1
-    else:
-        current = 1
+    current = _next_streak(current, last)
     best = max(best, current)
     cur.execute(
         """UPDATE commitments SET current_streak = ?, best_streak = ?, last_completed_date = ? WHERE id = ?""",
         (current, best, today, commitment_id),
     )
+    cur.execute(
+        "UPDATE schedule_daily_summary SET current_streak = ? WHERE date = ? AND commitment_id = ?",
+        (current, today, commitment_id),
+    )
+    events.append(
+        {"action_type": "commitment_day_done", "commitment_id": commitment_id, "target_id": commitment_id, "date_str": today}
+    )
+
+
+def _next_streak(current: int, last: Optional[str]) -> int:
+    """Streak length after logging today: +1 if the last log was yesterday, else a fresh run of 1."""
+    if not last:
+        return 1
+    try:
+        last_d = datetime.strptime(last[:10], "%Y-%m-%d").date()
+    except Exception:
+        return 1
+    return current + 1 if (date.today() - last_d).days == 1 else 1
 
 
 def mark_reminder_done(reminder_id: int) -> bool:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE reminders SET done = 1 WHERE id = ?", (reminder_id,))
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
-    return ok
+    return _apply(_mark_reminder_done, reminder_id)
+
+
+def _mark_reminder_done(cur, reminder_id: int, events: list) -> bool:
+    cur.execute("SELECT next_due, at_time, recurrence, done FROM reminders WHERE id = ?", (reminder_id,))
+    row = cur.fetchone()
+    if not row or row[3]:
+        return False  # missing, or already done: no second event in the log
+    # Recurring reminders stay done until the dispatcher reaches their next occurrence (scheduler.py)
+    next_due = next_due_after_done(row[0], row[1], row[2], datetime.now().replace(microsecond=0).isoformat())
+    cur.execute("UPDATE reminders SET done = 1, next_due = ? WHERE id = ?", (next_due, reminder_id))
+    events.append({"action_type": "reminder_done", "target_id": reminder_id})
+    return True
 
 
 def increment_counter(counter_id: int, by: int = 1) -> bool:
-    conn = get_conn()
-    cur = conn.cursor()
+    return _apply(_increment_counter, counter_id, by)
+
+
+def _increment_counter(cur, counter_id: int, by: int, events: list) -> bool:
     cur.execute(
         "UPDATE counters SET current_value = current_value + ?, last_updated = ? WHERE id = ?",
         (by, now_iso(), counter_id),
     )
-    conn.commit()
-    ok = cur.rowcount > 0
-    conn.close()
-    return ok
+    if cur.rowcount <= 0:
+        return False
+    events.append({"action_type": "counter_increment", "target_id": counter_id, "amount": by})
+    return True
 
 
 def update_streak(streak_id: int, completed_today: bool = True) -> bool:
     """If completed_today, increment streak and update last_activity_date."""
+    return _apply(_update_streak, streak_id)
+
+
+def _update_streak(cur, streak_id: int, events: list) -> bool:
     today = today_str()
-    conn = get_conn()
-    cur = conn.cursor()
     cur.execute(
         "SELECT current_streak, longest_streak, last_activity_date FROM streaks WHERE id = ?",
         (streak_id,),
     )
     row = cur.fetchone()
     if not row:
-        conn.close()
         return False
     current, longest, last = row[0], row[1], row[2]
     if last == today:
-        conn.close()
         return True  # already logged today
-    if last:
-        try:
-            last_d = datetime.strptime(last[:10], "%Y-%m-%d").date()
-            today_d = date.today()
-            if (today_d - last_d).days == 1:
-                current += 1
-            else:
-                current = 1
-        except Exception:
-            current = 1
-    else:
-        current = 1
+    current = _next_streak(current, last)
     longest = max(longest or 0, current)
     cur.execute(
         "UPDATE streaks SET current_streak = ?, longest_streak = ?, last_activity_date = ? WHERE id = ?",
         (current, longest, today, streak_id),
     )
-    conn.commit()
-    conn.close()
+    events.append({"action_type": "streak_log", "target_id": streak_id, "date_str": today})
     return True
+
+
+_CHECKOFFS = {
+    "schedule": _mark_schedule_done,
+    "reminder": _mark_reminder_done,
+    "counter": _increment_counter,
+    "streak": _update_streak,
+}
+
+
+def _parse_checkoff(op) -> tuple:
+    """(type, id, by) from one batch entry; ValueError if it is malformed."""
+    if not isinstance(op, dict) or op.get("type") not in _CHECKOFFS:
+        raise ValueError(f"each check-off needs a type: one of {', '.join(_CHECKOFFS)}")
+    target, by = op.get("id"), op.get("by", 1)
+    if type(target) is not int or type(by) is not int:
+        raise ValueError("id and by must be integers")
+    return op["type"], target, by
+
+
+def apply_checkoffs(ops: list) -> dict:
+    """Apply a batch of check-offs ({"type": "schedule"|"reminder"|"counter"|"streak", "id": N, "by": 1})
+    in one write transaction. Returns {"results": [{type, id, ok}], "changed": rows keyed like the brief}
+    with just the rows the batch touched, so the page can update in place."""
+    if not isinstance(ops, list):
+        raise ValueError("expected a list of check-offs")
+    if len(ops) > MAX_CHECKOFF_BATCH:
+        raise ValueError(f"Too many check-offs ({len(ops)}, max {MAX_CHECKOFF_BATCH})")
+    parsed = [_parse_checkoff(op) for op in ops]
+    events: list = []
+    results = []
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        for kind, target, by in parsed:
+            args = (target, by) if kind == "counter" else (target,)
+            results.append({"type": kind, "id": target, "ok": _CHECKOFFS[kind](cur, *args, events)})
+        write_events(cur, events)
+        changed = _changed_rows(cur, parsed)
+        conn.commit()
+    finally:
+        conn.close()
+    if events:
+        bump_data_generation()
+    return {"results": results, "changed": changed}
+
+
+def _changed_rows(cur, parsed: list) -> dict:
+    ids: dict = {kind: sorted({target for k, target, _by in parsed if k == kind}) for kind in _CHECKOFFS}
+
+    def rows(sql: str, kind_ids: list) -> list[dict]:
+        if not kind_ids:
+            return []
+        cur.execute(sql, (json.dumps(kind_ids),))
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    schedule = rows(
+        "SELECT id, commitment_id, completed FROM schedule_items WHERE id IN (SELECT value FROM json_each(?))",
+        ids["schedule"],
+    )
+    commitment_ids = sorted({r["commitment_id"] for r in schedule if r["commitment_id"] is not None})
+    streaks = rows(
+        """SELECT id, id AS commitment_id, current_streak, best_streak AS longest_streak, NULL AS streak_id
+           FROM commitments WHERE id IN (SELECT value FROM json_each(?)) AND last_completed_date IS NOT NULL""",
+        commitment_ids,
+    ) + rows(
+        """SELECT id, commitment_id, current_streak, longest_streak, id AS streak_id
+           FROM streaks WHERE id IN (SELECT value FROM json_each(?))""",
+        ids["streak"],
+    )
+    return {
+        "schedule": schedule,
+        "reminders": rows("SELECT id, done FROM reminders WHERE id IN (SELECT value FROM json_each(?))", ids["reminder"]),
+        "counters": rows(
+            "SELECT id, current_value, target_value FROM counters WHERE id IN (SELECT value FROM json_each(?))",
+            ids["counter"],
+        ),
+        "streaks": streaks,
+    }
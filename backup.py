@@ -0,0 +1,145 @@
+"""Online backups of the SQLite databases using the sqlite3 backup API.
+
+Copies run in small page steps with sleeps in between, so live requests and syncs keep
+getting the write lock. Snapshots are gzipped into data/backups/ and rotated.
+
+python backup.py              # shared DB + every per-user DB
+python backup.py --keep 14
+"""
+import argparse
+import gzip
+import re
+import shutil
+import sqlite3
+import threading
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from config import DATA_DIR, DB_PATH, USER_DB_DIR
+
+BACKUP_DIR = DATA_DIR / "backups"
+# Snapshots kept per database
+DEFAULT_KEEP = 7
+# Pages copied per step and pause between steps (seconds)
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.05
+
+_running = threading.Lock()
+
+
+def all_db_paths() -> list[Path]:
+    """The shared database plus every per-user database."""
+    paths = [Path(DB_PATH)] if Path(DB_PATH).exists() else []
+    if Path(USER_DB_DIR).is_dir():
+        paths += sorted(Path(USER_DB_DIR).glob("*.db"))
+    return paths
+
+
+def _dest_dir_for(db_path: Path, backup_dir: Path) -> Path:
+    # Keep per-user snapshots apart so a user called "commitments" can't clash with the shared DB
+    if Path(USER_DB_DIR) in db_path.parents:
+        return backup_dir / "users"
+    return backup_dir
+
+
+def backup_database(
+    db_path: Path,
+    backup_dir: Path = BACKUP_DIR,
+    keep: int = DEFAULT_KEEP,
+    pages: int = BACKUP_PAGES_PER_STEP,
+    sleep: float = BACKUP_STEP_SLEEP,
+) -> Path:
+    """Snapshot one database to <backup_dir>/<name>-<UTC stamp>.db.gz and rotate old snapshots. Returns the new file."""
+    db_path = Path(db_path)
+    dest_dir = _dest_dir_for(db_path, Path(backup_dir))
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+    raw = dest_dir / f".{db_path.stem}-{stamp}.db.tmp"
+    final = dest_dir / f"{db_path.stem}-{stamp}.db.gz"
+    partial = final.with_name(final.name + ".part")
+    src = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    dst = sqlite3.connect(raw)
+    try:
+        src.backup(dst, pages=pages, sleep=sleep)
+    finally:
+        dst.close()
+        src.close()
+    try:
+        with open(raw, "rb") as fin, gzip.open(partial, "wb", compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout, 1024 * 1024)
+        partial.replace(final)
+    finally:
+        raw.unlink(missing_ok=True)
+        partial.unlink(missing_ok=True)
+    _rotate(dest_dir, db_path.stem, keep)
+    return final
+
+
+def _rotate(dest_dir: Path, stem: str, keep: int) -> None:
+    # The whole name must match: user "foo-2024"'s snapshots also start with "foo-2"
+    own = re.compile(rf"{re.escape(stem)}-\d{{8}}T\d{{12}}Z\.db\.gz")
+    snapshots = sorted(p for p in dest_dir.glob(f"{stem}-*.db.gz") if own.fullmatch(p.name))
+    for old in snapshots[:-keep] if keep > 0 else []:
+        old.unlink(missing_ok=True)
+
+
+def backup_all(keep: int = DEFAULT_KEEP, backup_dir: Path = BACKUP_DIR) -> list[Path]:
+    """Back up every database, one after another. Skips (returns []) if a backup is already running."""
+    if not _running.acquire(blocking=False):
+        return []
+    try:
+        out = []
+        for path in all_db_paths():
+            try:
+                out.append(backup_database(path, backup_dir=backup_dir, keep=keep))
+            except Exception:
+                traceback.print_exc()
+        return out
+    finally:
+        _running.release()
+
+
+def backup_running() -> bool:
+    return _running.locked()
+
+
+def start_backup(keep: int = DEFAULT_KEEP) -> Optional[threading.Thread]:
+    """Run backup_all in a background thread. Returns None if a backup is already running."""
+    if backup_running():
+        return None
+    t = threading.Thread(target=backup_all, kwargs={"keep": keep}, name="sqlite-backup", daemon=True)
+    t.start()
+    return t
+
+
+def list_backups(backup_dir: Path = BACKUP_DIR) -> list[dict]:
+    """Existing snapshots, newest first: {name, bytes, modified}."""
+    backup_dir = Path(backup_dir)
+    if not backup_dir.is_dir():
+        return []
+    files = sorted(backup_dir.rglob("*.db.gz"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return [
+        {
+            "name": str(p.relative_to(backup_dir)),
+            "bytes": p.stat().st_size,
+            "modified": datetime.utcfromtimestamp(p.stat().st_mtime).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        for p in files
+    ]
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Back up the SQLite databases (online, non-blocking)")
+    ap.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="snapshots to keep per database")
+    args = ap.parse_args(argv)
+    written = backup_all(keep=args.keep)
+    for path in written:
+        print(path)
+    print(f"{len(written)} backup(s) written to {BACKUP_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,206 @@
+"""Micro-benchmarks for the hot functions at several database sizes, on throwaway synthetic databases.
+
+python bench.py                                   # sizes 100, 1000, 10000 commitments
+python bench.py --sizes 1000 --json > base.json   # save a baseline
+python bench.py --sizes 1000 --compare base.json  # show changes against it
+
+Each size gets its own database filled by synthetic.py. Every benchmark runs once unmeasured, then
+--runs times; the report has min, median and mean milliseconds per call. sync_tumblr replays generated
+posts (or a JSON list of fetch_posts() results given with --posts) instead of calling Tumblr.
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable
+
+import sync
+from assistant import build_assistant_message, get_today_brief, mark_schedule_done
+from db import get_conn, init_db, using_db
+from synthetic import generate, make_posts
+
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_RUNS = 20
+# Days of history generated for each size
+HISTORY_DAYS = 90
+# Posts replayed per sync_tumblr call
+SYNC_POSTS = 50
+# Median change (percent) reported as slower or faster in --compare
+NOISE_PERCENT = 10.0
+
+
+def _bench_init_db(ctx: dict) -> Callable:
+    return lambda i: init_db()
+
+
+def _bench_today_brief(ctx: dict) -> Callable:
+    return lambda i: get_today_brief(ctx["today"])
+
+
+def _bench_assistant_message(ctx: dict) -> Callable:
+    return lambda i: build_assistant_message(ctx["today"])
+
+
+def _bench_generate_day(ctx: dict) -> Callable:
+    # A new future day each call, so every call inserts that day's rows
+    start = date.fromisoformat(ctx["today"]) + timedelta(days=1)
+    return lambda i: sync.generate_schedule_for_date((start + timedelta(days=i)).isoformat())
+
+
+def _bench_mark_done(ctx: dict) -> Callable:
+    conn = get_conn()
+    ids = [r[0] for r in conn.execute(
+        "SELECT id FROM schedule_items WHERE date = ? AND completed = 0 ORDER BY id", (ctx["today"],)
+    )]
+    conn.close()
+    if not ids:
+        return None
+
+    return lambda i: mark_schedule_done(ids[i % len(ids)])
+
+
+def _bench_sync(ctx: dict) -> Callable:
+    replay = ctx["posts"]
+
+    def run(i):
+        # Fresh post ids each call, so every call stores and parses the whole batch
+        posts = [dict(p, id=f"{p['id']}-{ctx['size']}-{i}") for p in replay]
+        fetch, sync.fetch_posts = sync.fetch_posts, lambda **kw: posts
+        try:
+            result = sync.sync_tumblr(blog="bench", force_fetch=True)
+        finally:
+            sync.fetch_posts = fetch
+        if result["errors"]:
+            raise RuntimeError(result["errors"][0])
+
+    return run
+
+
+# (name, setup): setup(ctx) returns run(i), or None when the database has nothing to run it on
+BENCHMARKS = (
+    ("init_db", _bench_init_db),
+    ("get_today_brief", _bench_today_brief),
+    ("build_assistant_message", _bench_assistant_message),
+    ("generate_schedule_for_date", _bench_generate_day),
+    ("mark_schedule_done", _bench_mark_done),
+    ("sync_tumblr", _bench_sync),
+)
+
+
+def time_calls(run: Callable, runs: int) -> list:
+    """Seconds for each of `runs` calls, after one unmeasured call."""
+    run(0)
+    times = []
+    for i in range(1, runs + 1):
+        t = time.perf_counter()
+        run(i)
+        times.append(time.perf_counter() - t)
+    return times
+
+
+def run_suite(sizes, runs: int = DEFAULT_RUNS, only=None, posts=None, seed: int = 1) -> dict:
+    """Build a database per size and time each benchmark on it. Returns the report."""
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "runs": runs,
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        for size in sizes:
+            with using_db(Path(tmp) / f"bench-{size}.db"):
+                init_db()
+                generate(size, HISTORY_DAYS, seed)
+                ctx = {"size": size, "today": date.today().isoformat(), "posts": posts or make_posts(SYNC_POSTS, seed)}
+                for name, setup in BENCHMARKS:
+                    if only and name not in only:
+                        continue
+                    run = setup(ctx)
+                    if run is None:
+                        continue
+                    ms = [t * 1000 for t in time_calls(run, runs)]
+                    report["results"].append({
+                        "name": name,
+                        "size": size,
+                        "min_ms": round(min(ms), 3),
+                        "median_ms": round(statistics.median(ms), 3),
+                        "mean_ms": round(statistics.fmean(ms), 3),
+                    })
+                    print(f"  {name} @ {size}: {report['results'][-1]['median_ms']} ms", file=sys.stderr)
+    return report
+
+
+def compare(report: dict, baseline: dict, noise: float = NOISE_PERCENT) -> list:
+    """Median change per (name, size) present in both reports: dicts with base_ms, ms, change_pct, verdict."""
+    base = {(r["name"], r["size"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in report["results"]:
+        b = base.get((r["name"], r["size"]))
+        if b is None or not b["median_ms"]:
+            continue
+        change = (r["median_ms"] - b["median_ms"]) / b["median_ms"] * 100
+        verdict = "slower" if change > noise else "faster" if change < -noise else "same"
+        rows.append({"name": r["name"], "size": r["size"], "base_ms": b["median_ms"], "ms": r["median_ms"],
+                     "change_pct": round(change, 1), "verdict": verdict})
+    return rows
+
+
+def print_report(report: dict, comparison=None) -> None:
+    print(f"Python {report['python']}, SQLite {report['sqlite']}, {report['runs']} runs (median ms)")
+    if comparison is None:
+        print(f"{'benchmark':<28} {'size':>7} {'min':>9} {'median':>9} {'mean':>9}")
+        for r in report["results"]:
+            print(f"{r['name']:<28} {r['size']:>7} {r['min_ms']:>9} {r['median_ms']:>9} {r['mean_ms']:>9}")
+        return
+    print(f"{'benchmark':<28} {'size':>7} {'baseline':>9} {'now':>9} {'change':>8}")
+    for c in comparison:
+        flag = "" if c["verdict"] == "same" else f"  {c['verdict']}"
+        print(f"{c['name']:<28} {c['size']:>7} {c['base_ms']:>9} {c['ms']:>9} {c['change_pct']:>+7.1f}%{flag}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the hot sync, assistant and db functions")
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated commitment counts")
+    ap.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="measured calls per benchmark")
+    ap.add_argument("--only", help="comma-separated benchmark names (default: all)")
+    ap.add_argument("--posts", help="JSON list of fetch_posts() results to replay through sync_tumblr")
+    ap.add_argument("--seed", type=int, default=1, help="synthetic data seed")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--compare", metavar="BASELINE", help="JSON report of an earlier run to compare against")
+    ap.add_argument("--noise", type=float, default=NOISE_PERCENT, help="median change (%%) still reported as same")
+    ap.add_argument("--fail-slower", action="store_true", help="exit 1 when any benchmark is slower than the baseline")
+    args = ap.parse_args(argv)
+
+    try:
+        sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    except ValueError:
+        ap.error("--sizes must be comma-separated integers")
+    only = set(args.only.split(",")) if args.only else None
+    unknown = (only or set()) - {name for name, _ in BENCHMARKS}
+    if unknown:
+        ap.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    posts = json.loads(Path(args.posts).read_text(encoding="utf-8")) if args.posts else None
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+
+    report = run_suite(sizes, args.runs, only, posts, args.seed)
+    comparison = compare(report, baseline, args.noise) if baseline is not None else None
+    if comparison is not None:
+        report["comparison"] = comparison
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, comparison)
+    if args.fail_slower and comparison and any(c["verdict"] == "slower" for c in comparison):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,93 @@
+"""In-process cache for daily briefs and assistant messages, invalidated by the data generation.
+
+Every write path calls db.bump_data_generation(); entries built under an older generation are
+rebuilt on the next read, in every worker. Cached values are shared, so treat them as read-only.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from archive import get_heatmap
+from assistant import build_assistant_message, get_range_brief, get_today_brief, today_str
+from db import current_db_path, data_generation
+
+# Max cached entries per process (a brief and a message per user per date)
+BRIEF_CACHE_SIZE = int(os.getenv("BRIEF_CACHE_SIZE", "512"))
+
+
+class GenerationCache:
+    """Bounded LRU whose entries are only valid for the data generation they were built under."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()  # key -> (generation, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.evictions = 0
+
+    def get_or_build(self, key, build: Callable):
+        stamp = data_generation()  # read before building, so a concurrent write makes this entry stale
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[1]
+            self.misses += 1
+            if entry is not None:
+                self.stale += 1
+        value = build()
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+brief_cache = GenerationCache(BRIEF_CACHE_SIZE)
+
+
+def _key(kind: str, date_str: str) -> tuple:
+    # today_str is part of the key: past time-bound events are hidden relative to the current date
+    return (str(current_db_path()), kind, date_str, today_str())
+
+
+def cached_brief(date_str: Optional[str] = None, schedule_after: int = 0) -> dict:
+    date_str = date_str or today_str()
+    return brief_cache.get_or_build(
+        _key("brief", f"{date_str}>{schedule_after}"), lambda: get_today_brief(date_str, schedule_after)
+    )
+
+
+def cached_message(date_str: Optional[str] = None) -> str:
+    date_str = date_str or today_str()
+    return brief_cache.get_or_build(
+        _key("message", date_str), lambda: build_assistant_message(data=cached_brief(date_str))
+    )
+
+
+def cached_range(from_date: str, to_date: str) -> dict:
+    return brief_cache.get_or_build(_key("range", f"{from_date}..{to_date}"), lambda: get_range_brief(from_date, to_date))
+
+
+def cached_heatmap(year: int, commitment_id: Optional[int] = None) -> dict:
+    return brief_cache.get_or_build(_key("heatmap", f"{year}:{commitment_id}"), lambda: get_heatmap(year, commitment_id))
@@ -7,9 +7,12 @@ BASE_DIR = Path(__file__).resolve().parent
 # Load .env from project root (next to config.py) so keys are found regardless of cwd
 load_dotenv(BASE_DIR / ".env")
 
-DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
+# DATA_DIR env points the app at another data directory (e.g. a seeded copy for loadtest.py)
+DATA_DIR = Path(os.getenv("DATA_DIR") or BASE_DIR / "data")
+DATA_DIR.mkdir(parents=True, exist_ok=True)
 DB_PATH = DATA_DIR / "commitments.db"
+# One database per signed-in Tumblr user (see db.user_db_path)
+USER_DB_DIR = DATA_DIR / "users"
 
 
 def _env(key: str, default: str = "") -> str:
@@ -28,6 +31,20 @@ TUMBLR_OAUTH_TOKEN = _env("TUMBLR_OAUTH_TOKEN")
 TUMBLR_OAUTH_SECRET = _env("TUMBLR_OAUTH_SECRET")
 TUMBLR_BLOG = _env("TUMBLR_BLOG")
 
+# Local time (HH:MM) reminders without an at_time fire at (see scheduler.py)
+REMINDER_DEFAULT_TIME = _env("REMINDER_DEFAULT_TIME") or "09:00"
+
+# Shared secret for /admin endpoints (sent as X-Admin-Token). Admin endpoints are disabled when unset.
+ADMIN_TOKEN = _env("ADMIN_TOKEN")
+
+# Live Today page over /api/stream. Each open stream holds a worker thread for as long as the tab is open,
+# so only turn this on when serving with threaded or evented workers (e.g. gunicorn -k gthread --threads 50).
+LIVE_UPDATES = _env("LIVE_UPDATES").lower() in ("1", "true", "yes", "on")
+
+# Fraction of requests (0-1) profiled into data/profiles (see profiling.py), and how many runs to keep
+PROFILE_SAMPLE_RATE = float(_env("PROFILE_SAMPLE_RATE") or "0")
+PROFILE_KEEP = int(_env("PROFILE_KEEP") or "50")
+
 
 def _tumblr_token_from_db():
     """Load token/secret from DB if not in env (set by in-app Connect Tumblr flow)."""
@@ -1,29 +1,285 @@
 """SQLite schema and access for commitments, tasks, counters, streaks."""
+import contextvars
+import os
+import re
 import sqlite3
-from datetime import datetime
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Optional
 import json
 
-from config import DB_PATH
+from config import DB_PATH, USER_DB_DIR
 
+# Open handles kept per thread (across all user DBs) and how long an idle one may live
+MAX_OPEN_DBS = int(os.getenv("MAX_OPEN_DBS", "64"))
+DB_IDLE_SECONDS = 300
+# Idle handles kept per DB per thread (nested get_conn calls need more than one)
+_MAX_IDLE_PER_DB = 4
 
-def _add_column_if_missing(cur, table: str, column: str, col_type: str):
+
+# Derived columns for the Manage filters. Each has an expression index, so filtered id-ordered pages
+# are index range scans; queries must use these exact strings for SQLite to match the indexes.
+SOURCE_SQL = (
+    "(CASE WHEN source_post_id IS NULL OR source_post_id = '' OR substr(source_post_id, 1, 7) = 'import:' "
+    "THEN 'import' ELSE 'tumblr' END)"
+)
+STATUS_SQL = "COALESCE(status, 'pending')"
+
+
+def _add_column_if_missing(cur, table: str, column: str, col_type: str) -> bool:
+    """Add column if the table lacks it. Returns True when the column was added."""
     cur.execute(f"PRAGMA table_info({table})")
     existing = [row[1] for row in cur.fetchall()]
     if column not in existing:
         cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+        return True
+    return False
 
 
-def get_conn():
-    Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+# Which database this request/thread talks to. None = the shared DB_PATH (anonymous / CLI use).
+_current_db: contextvars.ContextVar = contextvars.ContextVar("current_db", default=None)
+
+
+def user_db_path(user: str) -> Path:
+    """Per-user database file for a signed-in Tumblr identity."""
+    safe = re.sub(r"[^a-z0-9_-]", "_", (user or "").strip().lower())
+    if not safe.strip("_"):
+        raise ValueError(f"Invalid user name: {user!r}")
+    return Path(USER_DB_DIR) / f"{safe}.db"
+
+
+def current_db_path() -> Path:
+    return _current_db.get() or Path(DB_PATH)
+
+
+def use_db(path) -> contextvars.Token:
+    """Point get_conn() at `path` (None = shared DB) until reset_db(token)."""
+    return _current_db.set(Path(path) if path else None)
+
+
+def use_user(user: Optional[str]) -> contextvars.Token:
+    return use_db(user_db_path(user) if user else None)
+
+
+def reset_db(token: contextvars.Token) -> None:
+    _current_db.reset(token)
+
+
+@contextmanager
+def using_db(path):
+    token = use_db(path)
+    try:
+        yield
+    finally:
+        reset_db(token)
+
+
+# Called as hook(caller, seconds, statements) for every statement and fetch when set (see set_sql_hook)
+_sql_hook = None
+
+
+def set_sql_hook(fn) -> None:
+    """Time SQL on pooled connections: fn(caller, seconds, statements) runs after each execute (statements=1)
+    and fetch (statements=0), caller being "module.function" of the code that issued the statement (skipping @sql_helper functions). None turns it off."""
+    global _sql_hook
+    _sql_hook = fn
+
+
+# Code objects of shared query helpers; their statements are attributed to whoever called them
+_sql_helpers: set = set()
+
+
+def sql_helper(fn):
+    """Mark fn as a shared query helper (e.g. sync._fetch_visible) so set_sql_hook attributes the statements
+    it runs to its caller rather than to the helper itself."""
+    _sql_helpers.add(fn.__code__)
+    return fn
+
+
+def _caller(depth: int) -> str:
+    frame = sys._getframe(depth + 1)
+    while frame.f_code in _sql_helpers and frame.f_back is not None:
+        frame = frame.f_back
+    return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}"
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """Cursor that reports statement and fetch time to _sql_hook, attributed to the caller of execute()."""
+
+    caller = "?"
+
+    def _timed(self, method, statements: int, *args):
+        t = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            hook = _sql_hook
+            if hook is not None:
+                hook(self.caller, time.perf_counter() - t, statements)
+
+    def execute(self, *args):
+        self.caller = _caller(1)
+        return self._timed(sqlite3.Cursor.execute, 1, *args)
+
+    def executemany(self, *args):
+        self.caller = _caller(1)
+        return self._timed(sqlite3.Cursor.executemany, 1, *args)
+
+    def fetchone(self):
+        return self._timed(sqlite3.Cursor.fetchone, 0)
+
+    def fetchmany(self, *args):
+        return self._timed(sqlite3.Cursor.fetchmany, 0, *args)
+
+    def fetchall(self):
+        return self._timed(sqlite3.Cursor.fetchall, 0)
+
+
+class _PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to the per-thread pool."""
+
+    db_path = ""
+    idle = False
+
+    def close(self):
+        _release(self)
+
+    def cursor(self, factory=None):
+        if factory is None and _sql_hook is not None:
+            factory = _TimedCursor
+        return sqlite3.Connection.cursor(self, factory or sqlite3.Cursor)
+
+    # Connection.execute() bypasses an overridden Cursor.execute, so route it through cursor() when timing
+    def execute(self, *args):
+        if _sql_hook is None:
+            return sqlite3.Connection.execute(self, *args)
+        cur = self.cursor()
+        cur.caller = _caller(1)
+        return cur._timed(sqlite3.Cursor.execute, 1, *args)
+
+    def executemany(self, *args):
+        if _sql_hook is None:
+            return sqlite3.Connection.executemany(self, *args)
+        cur = self.cursor()
+        cur.caller = _caller(1)
+        return cur._timed(sqlite3.Cursor.executemany, 1, *args)
+
+    def discard(self):
+        sqlite3.Connection.close(self)
+
+
+# Per-thread LRU: db path -> [(idle connection, released_at)]. Connections never cross threads.
+_pool = threading.local()
+_schema_ready: set = set()
+_schema_lock = threading.Lock()
+
+
+def _thread_handles() -> OrderedDict:
+    handles = getattr(_pool, "handles", None)
+    if handles is None:
+        handles = _pool.handles = OrderedDict()
+    return handles
+
+
+def _reset_pool_after_fork():
+    global _pool
+    _pool = threading.local()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+def _open(path: Path) -> _PooledConnection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, factory=_PooledConnection)
     conn.row_factory = sqlite3.Row
+    conn.db_path = str(path)
     return conn
 
 
+def _release(conn: _PooledConnection) -> None:
+    if conn.idle:
+        return
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except sqlite3.Error:
+        conn.discard()
+        return
+    handles = _thread_handles()
+    now = time.monotonic()
+    idle = handles.setdefault(conn.db_path, [])
+    if len(idle) >= _MAX_IDLE_PER_DB:
+        conn.discard()
+    else:
+        conn.idle = True
+        idle.append((conn, now))
+    handles.move_to_end(conn.db_path)
+    _evict(handles, now)
+
+
+def _evict(handles: OrderedDict, now: float) -> None:
+    for key in list(handles):
+        idle = handles[key]
+        fresh = [(c, t) for c, t in idle if now - t < DB_IDLE_SECONDS]
+        for c, t in idle:
+            if now - t >= DB_IDLE_SECONDS:
+                c.discard()
+        if fresh:
+            handles[key] = fresh
+        else:
+            del handles[key]
+    total = sum(len(v) for v in handles.values())
+    while total > MAX_OPEN_DBS and handles:
+        _, idle = handles.popitem(last=False)
+        for c, _t in idle:
+            c.discard()
+        total -= len(idle)
+
+
+def close_idle_connections() -> None:
+    """Close every idle pooled handle held by the calling thread."""
+    handles = _thread_handles()
+    for idle in handles.values():
+        for c, _t in idle:
+            c.discard()
+    handles.clear()
+
+
+def get_conn():
+    path = current_db_path()
+    key = str(path)
+    handles = _thread_handles()
+    idle = handles.get(key)
+    if idle:
+        conn, _t = idle.pop()
+        conn.idle = False
+        if not idle:
+            del handles[key]
+        return conn
+    if key not in _schema_ready:
+        init_db()
+    return _open(path)
+
+
 def init_db():
-    conn = get_conn()
+    path = current_db_path()
+    with _schema_lock:
+        conn = _open(path)
+        # WAL (kept in the file once set) lets readers, e.g. a long streamed export, run alongside writers
+        conn.execute("PRAGMA journal_mode=WAL")
+        _create_schema(conn)
+        conn.discard()
+        _schema_ready.add(str(path))
+
+
+def _create_schema(conn):
     cur = conn.cursor()
 
     # Raw Tumblr posts we've seen (to avoid re-processing)
@@ -67,6 +323,12 @@ def init_db():
     _add_column_if_missing(cur, "commitments", "current_streak", "INTEGER DEFAULT 0")
     _add_column_if_missing(cur, "commitments", "best_streak", "INTEGER DEFAULT 0")
     _add_column_if_missing(cur, "commitments", "last_completed_date", "TEXT")
+    # Manage page filters + keyset pagination (see sync.get_commitments_page)
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_commitments_status ON commitments({STATUS_SQL}, id)")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_commitments_source ON commitments({SOURCE_SQL}, id)")
+    cur.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_commitments_source_status ON commitments({SOURCE_SQL}, {STATUS_SQL}, id)"
+    )
 
     # Reminders (one-off or recurring)
     cur.execute("""
@@ -83,6 +345,10 @@ def init_db():
         )
     """)
 
+    _add_column_if_missing(cur, "reminders", "last_fired_at", "TEXT")
+    # The dispatcher (scheduler.py) reads undone reminders in next_due order
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders(done, next_due)")
+
     # Daily schedule items (what to do on a given day)
     cur.execute("""
         CREATE TABLE IF NOT EXISTS schedule_items (
@@ -136,18 +402,65 @@ def init_db():
         )
     """)
 
-    # Log of completed actions (for streak and counter updates)
+    # Append-only log of check-offs; counters and streaks can be rebuilt from it (see activity.py)
     cur.execute("""
         CREATE TABLE IF NOT EXISTS activity_log (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             commitment_id INTEGER,
             action_type TEXT,
+            target_id INTEGER,
+            amount INTEGER DEFAULT 1,
             date TEXT NOT NULL,
             notes TEXT,
             created_at TEXT,
             FOREIGN KEY (commitment_id) REFERENCES commitments(id)
         )
     """)
+    _add_column_if_missing(cur, "activity_log", "amount", "INTEGER DEFAULT 1")
+    if _add_column_if_missing(cur, "activity_log", "target_id", "INTEGER"):
+        _seed_activity_baseline(cur)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_activity_log_action_target ON activity_log(action_type, target_id, date)"
+    )
+
+    # Per-day, per-commitment schedule totals, kept up to date by schedule generation and check-offs
+    # and kept after archive.py deletes old schedule_items; /api/heatmap and /api/history read only this.
+    # activity_daily_summary holds archived activity_log rows.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_daily_summary (
+            date TEXT NOT NULL,
+            commitment_id INTEGER NOT NULL,
+            total_items INTEGER DEFAULT 0,
+            completed_items INTEGER DEFAULT 0,
+            archived_at TEXT,
+            PRIMARY KEY (date, commitment_id)
+        )
+    """)
+    # current_streak is deliberately not in CREATE TABLE: adding it marks the one-time backfill of live rows
+    if _add_column_if_missing(cur, "schedule_daily_summary", "current_streak", "INTEGER"):
+        _seed_daily_summary(cur)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_schedule_daily_summary_commitment ON schedule_daily_summary(commitment_id, date)"
+    )
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS activity_daily_summary (
+            date TEXT NOT NULL,
+            commitment_id INTEGER NOT NULL,
+            action_type TEXT NOT NULL,
+            target_id INTEGER NOT NULL DEFAULT 0,
+            events INTEGER DEFAULT 0,
+            amount INTEGER DEFAULT 0,
+            archived_at TEXT
+        )
+    """)
+    _add_column_if_missing(cur, "activity_daily_summary", "target_id", "INTEGER NOT NULL DEFAULT 0")
+    _add_column_if_missing(cur, "activity_daily_summary", "amount", "INTEGER DEFAULT 0")
+    # Summary key includes target_id so counter/streak totals survive archiving
+    cur.execute("DROP INDEX IF EXISTS idx_activity_daily_summary_key")
+    cur.execute(
+        """CREATE UNIQUE INDEX IF NOT EXISTS idx_activity_daily_summary_target
+           ON activity_daily_summary(date, commitment_id, action_type, target_id)"""
+    )
 
     # Punishment triggers (conditions that trigger a "punishment" reminder)
     cur.execute("""
@@ -171,21 +484,227 @@ def init_db():
         )
     """)
 
+    _create_search_index(cur)
     conn.commit()
-    conn.close()
+
+
+def _table_exists(cur, name: str) -> bool:
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return cur.fetchone() is not None
+
+
+def _create_search_index(cur) -> None:
+    """FTS5 indexes for /api/search, kept in sync by triggers (see search.py). Skipped when this SQLite
+    build lacks FTS5; search then falls back to LIKE."""
+    if not _table_exists(cur, "commitments_fts"):
+        try:
+            cur.execute(
+                """CREATE VIRTUAL TABLE commitments_fts USING fts5(
+                       raw_text, task_description, content='commitments', content_rowid='id', prefix='3'
+                   )"""
+            )
+        except sqlite3.OperationalError:
+            return  # no FTS5 module
+        cur.execute("INSERT INTO commitments_fts(commitments_fts) VALUES ('rebuild')")
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS commitments_fts_insert AFTER INSERT ON commitments BEGIN
+            INSERT INTO commitments_fts(rowid, raw_text, task_description)
+            VALUES (new.id, new.raw_text, new.task_description);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS commitments_fts_delete AFTER DELETE ON commitments BEGIN
+            INSERT INTO commitments_fts(commitments_fts, rowid, raw_text, task_description)
+            VALUES ('delete', old.id, old.raw_text, old.task_description);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS commitments_fts_update AFTER UPDATE OF raw_text, task_description ON commitments
+        BEGIN
+            INSERT INTO commitments_fts(commitments_fts, rowid, raw_text, task_description)
+            VALUES ('delete', old.id, old.raw_text, old.task_description);
+            INSERT INTO commitments_fts(rowid, raw_text, task_description)
+            VALUES (new.id, new.raw_text, new.task_description);
+        END
+    """)
+    # tumblr_posts has a TEXT key, and VACUUM may renumber its implicit rowids, so this index keeps its
+    # own copy of the text (needed for snippets anyway) and refers to posts by id
+    if not _table_exists(cur, "tumblr_posts_fts"):
+        cur.execute("CREATE VIRTUAL TABLE tumblr_posts_fts USING fts5(body_text, post_id UNINDEXED, prefix='3')")
+        cur.execute("INSERT INTO tumblr_posts_fts(body_text, post_id) SELECT body_text, id FROM tumblr_posts")
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS tumblr_posts_fts_insert AFTER INSERT ON tumblr_posts BEGIN
+            INSERT INTO tumblr_posts_fts(body_text, post_id) VALUES (new.body_text, new.id);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS tumblr_posts_fts_delete AFTER DELETE ON tumblr_posts BEGIN
+            DELETE FROM tumblr_posts_fts WHERE post_id = old.id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS tumblr_posts_fts_update AFTER UPDATE OF body_text ON tumblr_posts BEGIN
+            DELETE FROM tumblr_posts_fts WHERE post_id = old.id;
+            INSERT INTO tumblr_posts_fts(body_text, post_id) VALUES (new.body_text, new.id);
+        END
+    """)
+
+
+def _seed_daily_summary(cur):
+    """Fold live dated schedule_items into schedule_daily_summary once, when it becomes live-maintained.
+    Before that it only held archived days, so adding the live counts on top is exact."""
+    cur.execute(
+        """INSERT INTO schedule_daily_summary (date, commitment_id, total_items, completed_items)
+           SELECT date, COALESCE(commitment_id, 0), COUNT(*), SUM(completed = 1)
+           FROM schedule_items WHERE date != '' GROUP BY date, COALESCE(commitment_id, 0)
+           ON CONFLICT(date, commitment_id) DO UPDATE SET
+               total_items = total_items + excluded.total_items,
+               completed_items = completed_items + excluded.completed_items"""
+    )
+    cur.execute(
+        """UPDATE schedule_daily_summary SET current_streak = (
+               SELECT c.current_streak FROM commitments c WHERE c.id = schedule_daily_summary.commitment_id
+           )
+           WHERE EXISTS (
+               SELECT 1 FROM commitments c
+               WHERE c.id = schedule_daily_summary.commitment_id AND c.last_completed_date = schedule_daily_summary.date
+           )"""
+    )
+
+
+def _seed_activity_baseline(cur):
+    """Record pre-existing counter, streak and reminder state as events when activity_log first gains
+    target_id, so rebuilding from the log reproduces what was there before logging started."""
+    today, created = date.today().isoformat(), now_iso()
+    cur.execute(
+        """INSERT INTO activity_log (commitment_id, action_type, target_id, amount, date, notes, created_at)
+           SELECT commitment_id, 'counter_increment', id, current_value, ?, 'baseline', ?
+           FROM counters WHERE current_value != 0""",
+        (today, created),
+    )
+    cur.execute(
+        """INSERT INTO activity_log (commitment_id, action_type, target_id, amount, date, notes, created_at)
+           SELECT commitment_id, 'reminder_done', id, 1, ?, 'baseline', ? FROM reminders WHERE done = 1""",
+        (today, created),
+    )
+    runs = []
+    cur.execute(
+        """SELECT commitment_id, 'streak_log', id, current_streak, last_activity_date FROM streaks
+           WHERE current_streak > 0 AND last_activity_date IS NOT NULL"""
+    )
+    runs += cur.fetchall()
+    cur.execute(
+        """SELECT id, 'commitment_day_done', id, current_streak, last_completed_date FROM commitments
+           WHERE current_streak > 0 AND last_completed_date IS NOT NULL"""
+    )
+    runs += cur.fetchall()
+    events = []
+    for commitment_id, action_type, target_id, length, last in runs:
+        try:
+            last_d = datetime.strptime(last[:10], "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        for i in range(length):
+            d = (last_d - timedelta(days=i)).isoformat()
+            events.append((commitment_id, action_type, target_id, 1, d, "baseline", created))
+    cur.executemany(
+        """INSERT INTO activity_log (commitment_id, action_type, target_id, amount, date, notes, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        events,
+    )
 
 
 def now_iso():
     return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
-def get_setting(key: str) -> Optional[str]:
+# Generation files: a tiny side file per kind next to the DB. Writers append one byte,
+# readers compare os.stat() stamps, so every gunicorn worker sees changes without a query.
+_GENERATION_ROLLOVER_BYTES = 64 * 1024
+
+
+def _generation_path(kind: str) -> Path:
+    db_path = current_db_path()
+    return db_path.with_name(f"{db_path.stem}.{kind}.gen")
+
+
+def generation(kind: str) -> tuple:
+    """Cheap cross-process change stamp for `kind` (one stat call, no SQLite)."""
+    try:
+        st = os.stat(_generation_path(kind))
+    except FileNotFoundError:
+        return (0, 0, 0)
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def bump_generation(kind: str) -> None:
+    """Mark `kind` as changed for all processes sharing this DB."""
+    path = _generation_path(kind)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "ab") as f:
+        f.write(b".")
+        size = f.tell()
+    if size >= _GENERATION_ROLLOVER_BYTES:
+        # Swap in a fresh file; the new inode keeps the stamp distinct from every earlier one
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(b"")
+        os.replace(tmp, path)
+
+
+def data_generation() -> tuple:
+    """Stamp that changes whenever commitments, schedules, counters, streaks or reminders are written."""
+    return generation("data")
+
+
+# Called with the DB path after every data bump in this process (see notify.py); other processes are
+# picked up by watching the generation file.
+_data_listeners: list = []
+
+
+def add_data_listener(fn) -> None:
+    _data_listeners.append(fn)
+
+
+def bump_data_generation() -> None:
+    """Call after committing any write that can change a brief (invalidates caches in every worker)."""
+    bump_generation("data")
+    path = current_db_path()
+    for fn in _data_listeners:
+        fn(path)
+
+
+# Process-local copies of app_settings per DB, reloaded only when that DB's settings generation changes
+_MAX_CACHED_SETTINGS = 1024
+_settings_cache: OrderedDict = OrderedDict()  # db path -> (stamp, values)
+_settings_lock = threading.Lock()
+
+
+def _load_settings() -> dict:
+    key = str(current_db_path())
+    stamp = generation("settings")
+    cached = _settings_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
-    row = cur.fetchone()
+    cur.execute("SELECT key, value FROM app_settings")
+    values = {row[0]: row[1] for row in cur.fetchall()}
     conn.close()
-    return row[0] if row else None
+    with _settings_lock:
+        _settings_cache[key] = (stamp, values)
+        _settings_cache.move_to_end(key)
+        while len(_settings_cache) > _MAX_CACHED_SETTINGS:
+            _settings_cache.popitem(last=False)
+    return values
+
+
+def invalidate_settings_cache() -> None:
+    with _settings_lock:
+        _settings_cache.pop(str(current_db_path()), None)
+
+
+def get_setting(key: str) -> Optional[str]:
+    return _load_settings().get(key)
 
 
 def set_setting(key: str, value: str) -> None:
@@ -197,3 +716,5 @@ def set_setting(key: str, value: str) -> None:
     )
     conn.commit()
     conn.close()
+    bump_generation("settings")
+    invalidate_settings_cache()
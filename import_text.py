@@ -1,5 +1,5 @@
 """Import commitments from pasted text (no Tumblr API)."""
-from db import get_conn, init_db, now_iso
+from db import get_conn, init_db, now_iso, bump_data_generation
 from parser import extract_commitments
 from sync import _ensure_commitment_id, _derive_schedule_and_reminders, _derive_counters, _derive_streaks, _derive_punishment
 
@@ -24,4 +24,5 @@ def import_from_text(text: str, source_label: str = "pasted") -> int:
         _derive_punishment(cur, c, cid or 0)
     conn.commit()
     conn.close()
+    bump_data_generation()
     return count
@@ -0,0 +1,255 @@
+"""HTTP load test: start gunicorn on a seeded data directory, drive a mix of page views, API reads and
+check-offs from concurrent clients, and report throughput and p50/p95/p99 latency per route.
+
+python loadtest.py                                   # 1 worker x 8 threads, 16 clients, 30 s
+python loadtest.py --workers 2 --threads 16 --clients 64 --duration 60
+python loadtest.py --url http://localhost:5000       # an already running server (no seeding)
+python loadtest.py --json > run.json                 # machine-readable report
+python loadtest.py --synthetic 20000                 # against a large database
+
+Without --data-dir a throwaway directory is seeded; the app never touches data/.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# (route, relative weight): roughly what an open Today tab plus occasional review produces
+ROUTE_MIX = (
+    ("GET /", 30),
+    ("GET /api/today", 25),
+    ("GET /api/assistant-message", 15),
+    ("POST /api/checkoff", 15),
+    ("GET /manage", 15),
+)
+SEED_TEXT = """Daily: morning stretch.
+Rule: no orgasm every day.
+Streak: 5 days.
+Poll winner = 7 days locked.
+I will edge every day for 30 days.
+If you break a rule, then add 3 days.
+Remind me to journal at 21:00 every day.
+Daily: 20 squats.
+Daily: read for 15 minutes."""
+# Days of schedule generated around today when seeding
+SEED_DAYS = 30
+READY_TIMEOUT_SECONDS = 30
+
+
+def seed(data_dir: Path, copies: int = 20, synthetic: int = 0) -> None:
+    """Fill data_dir with commitments and a couple of months of schedule. Run with DATA_DIR already set.
+    With synthetic > 0, that many generated commitments (and their history) are added as well."""
+    # Imported here: config reads DATA_DIR at import time
+    from import_text import import_from_text
+    from sync import generate_schedule_for_range
+
+    for i in range(copies):
+        import_from_text(SEED_TEXT, f"loadtest-{i}")
+    if synthetic:
+        from synthetic import generate
+
+        generate(synthetic)
+    today = date.today()
+    generate_schedule_for_range(
+        (today - timedelta(days=SEED_DAYS)).isoformat(), (today + timedelta(days=SEED_DAYS)).isoformat()
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, threads: int, port: int) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "gunicorn", "app:app",
+        "-w", str(workers), "-k", "gthread", "--threads", str(threads),
+        "-b", f"127.0.0.1:{port}", "--log-level", "warning",
+    ]
+    return subprocess.Popen(cmd, cwd=BASE_DIR, env=os.environ.copy())
+
+
+def wait_ready(host: str, port: int, proc: Optional[subprocess.Popen] = None) -> None:
+    deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"server exited with status {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", "/api/today")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def _checkoff_targets(host: str, port: int) -> list:
+    """Check-off bodies built from today's brief: counters can be bumped any number of times."""
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    conn.request("GET", "/api/today")
+    brief = json.loads(conn.getresponse().read())
+    ops = [{"type": "counter", "id": c["id"], "by": 1} for c in brief.get("counters", [])]
+    ops += [{"type": "schedule", "id": s["id"]} for s in brief.get("schedule", [])]
+    return ops or [{"type": "counter", "id": 0, "by": 1}]
+
+
+class _Client(threading.Thread):
+    """One simulated user on a keep-alive connection, picking routes from the mix until stopped."""
+
+    def __init__(self, host, port, routes, weights, checkoffs, stop, seed_value):
+        super().__init__(daemon=True)
+        self.host, self.port = host, port
+        self.routes, self.weights, self.checkoffs = routes, weights, checkoffs
+        self.stop_event = stop
+        self.rng = random.Random(seed_value)
+        self.samples: list = []  # (route, seconds, ok)
+        self.recording = False
+
+    def _request(self, conn, route: str) -> bool:
+        method, path = route.split(" ", 1)
+        body, headers = None, {}
+        if method == "POST":
+            body = json.dumps([self.rng.choice(self.checkoffs)])
+            headers["Content-Type"] = "application/json"
+        conn.request(method, path, body=body, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status < 400
+
+    def run(self) -> None:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        while not self.stop_event.is_set():
+            route = self.rng.choices(self.routes, self.weights)[0]
+            t = time.perf_counter()
+            try:
+                ok = self._request(conn, route)
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            if self.recording:
+                self.samples.append((route, time.perf_counter() - t, ok))
+        conn.close()
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = math.ceil(p / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(k, len(sorted_values) - 1))]
+
+
+def run_load(host: str, port: int, clients: int, duration: float, warmup: float, mix=ROUTE_MIX) -> dict:
+    """Drive the server for warmup + duration seconds; only the last `duration` seconds are reported."""
+    routes, weights = [r for r, _ in mix], [w for _, w in mix]
+    checkoffs = _checkoff_targets(host, port)
+    stop = threading.Event()
+    workers = [_Client(host, port, routes, weights, checkoffs, stop, i) for i in range(clients)]
+    for w in workers:
+        w.start()
+    time.sleep(warmup)
+    for w in workers:
+        w.recording = True
+    started = time.perf_counter()
+    time.sleep(duration)
+    elapsed = time.perf_counter() - started
+    for w in workers:
+        w.recording = False
+    stop.set()
+    for w in workers:
+        w.join()
+    by_route: dict = {}
+    for w in workers:
+        for route, seconds, ok in w.samples:
+            entry = by_route.setdefault(route, {"latencies": [], "errors": 0})
+            entry["latencies"].append(seconds)
+            entry["errors"] += 0 if ok else 1
+    report = {"clients": clients, "duration_seconds": round(elapsed, 3), "routes": {}}
+    total = errors = 0
+    for route in routes:
+        entry = by_route.get(route, {"latencies": [], "errors": 0})
+        lat = sorted(entry["latencies"])
+        total += len(lat)
+        errors += entry["errors"]
+        report["routes"][route] = {
+            "requests": len(lat),
+            "errors": entry["errors"],
+            "rps": round(len(lat) / elapsed, 1),
+            "p50_ms": round(percentile(lat, 50) * 1000, 2),
+            "p95_ms": round(percentile(lat, 95) * 1000, 2),
+            "p99_ms": round(percentile(lat, 99) * 1000, 2),
+        }
+    report.update(requests=total, errors=errors, rps=round(total / elapsed, 1))
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['clients']} clients, {report['duration_seconds']} s: {report['requests']} requests, "
+          f"{report['rps']} req/s, {report['errors']} error(s)")
+    print(f"{'route':<30} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for route, r in report["routes"].items():
+        print(f"{route:<30} {r['rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['errors']:>7}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Load test the web app under gunicorn")
+    ap.add_argument("--workers", type=int, default=1, help="gunicorn worker processes")
+    ap.add_argument("--threads", type=int, default=8, help="threads per worker (gthread)")
+    ap.add_argument("--clients", type=int, default=16, help="concurrent simulated users")
+    ap.add_argument("--duration", type=float, default=30, help="measured seconds")
+    ap.add_argument("--warmup", type=float, default=3, help="unmeasured seconds first")
+    ap.add_argument("--data-dir", help="use this data directory instead of seeding a temporary one (check-offs write to it)")
+    ap.add_argument("--synthetic", type=int, default=0, metavar="N",
+                    help="also seed N generated commitments with months of history (see synthetic.py)")
+    ap.add_argument("--url", help="test a server that is already running instead of starting gunicorn")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args(argv)
+
+    if args.url:
+        parts = urlsplit(args.url)
+        report = run_load(parts.hostname, parts.port or 80, args.clients, args.duration, args.warmup)
+    else:
+        tmp = None if args.data_dir else tempfile.mkdtemp(prefix="loadtest-")
+        os.environ["DATA_DIR"] = str(Path(args.data_dir or tmp).resolve())
+        proc = None
+        try:
+            if tmp:
+                seed(Path(tmp), synthetic=args.synthetic)
+            port = _free_port()
+            proc = start_server(args.workers, args.threads, port)
+            wait_ready("127.0.0.1", port, proc)
+            report = run_load("127.0.0.1", port, args.clients, args.duration, args.warmup)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=30)
+            if tmp:
+                shutil.rmtree(tmp, ignore_errors=True)
+        report.update(workers=args.workers, threads=args.threads)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+"""Prometheus text-format metrics for GET /metrics: request latency per route, SQL statements and time
+per calling function, sync and parse counters.
+
+Values live in this process. With several gunicorn workers each scrape sees only the worker that
+answered it; the recommended single threaded worker (README) reports everything.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Optional
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Counter:
+    """Monotonic total per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self._values: dict = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, *labels) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, v in sorted(items):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}"
+
+
+class Histogram:
+    """Bucketed observations per label set (count, sum, cumulative buckets)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help_text, labelnames, buckets
+        self._values: dict = {}  # labels -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def count(self, *labels) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        names = self.labelnames + ("le",)
+        for labels, counts, total in sorted(items):
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                yield f"{self.name}_bucket{_labels(names, labels + (le,))} {running}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {running}"
+
+
+class Gauge:
+    """Value read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name, self.help, self.read = name, help_text, read
+        _registry.append(self)
+
+    def samples(self):
+        yield f"{self.name} {_number(self.read())}"
+
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to build the response (first byte for streams)", ("route", "method")
+)
+SQL_STATEMENTS = Counter("sqlite_statements_total", "SQL statements executed, by calling function", ("caller",))
+SQL_SECONDS = Counter(
+    "sqlite_seconds_total", "Time in SQLite (execute and fetch), by calling function", ("caller",)
+)
+SYNC_RUNS = Counter("sync_runs_total", "Tumblr syncs by outcome", ("outcome",))
+SYNC_SECONDS = Histogram("sync_duration_seconds", "Tumblr sync duration", buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+SYNC_POSTS = Counter("sync_posts_fetched_total", "Posts fetched from Tumblr")
+SYNC_COMMITMENTS = Counter("sync_commitments_total", "Commitments created by syncs")
+PARSE_CALLS = Counter("parse_texts_total", "Texts run through the commitment parser")
+PARSE_COMMITMENTS = Counter("parse_commitments_total", "Commitments found by the parser")
+PARSE_SECONDS = Counter("parse_seconds_total", "Time spent parsing")
+
+
+def observe_sql(caller: str, seconds: float, statements: int) -> None:
+    """db.set_sql_hook callback."""
+    if statements:
+        SQL_STATEMENTS.inc(statements, caller)
+    SQL_SECONDS.inc(seconds, caller)
+
+
+def record_sync(result: dict, seconds: float) -> None:
+    """Count one sync_tumblr() result."""
+    if result.get("errors"):
+        outcome = "error"
+    elif result.get("used_cache"):
+        outcome = "cached"
+    else:
+        outcome = "ok"
+    SYNC_RUNS.inc(1, outcome)
+    SYNC_SECONDS.observe(seconds)
+    SYNC_POSTS.inc(result.get("posts_fetched", 0))
+    SYNC_COMMITMENTS.inc(result.get("new_commitments", 0))
+
+
+def render() -> str:
+    """Every registered metric in Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def instrument_app(app) -> None:
+    """Record latency and status for every request, labelled by URL rule (not path, to keep series bounded)."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started: Optional[float] = g.pop("metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            HTTP_LATENCY.observe(time.perf_counter() - started, route, request.method)
+            HTTP_REQUESTS.inc(1, route, request.method, str(response.status_code))
+        return response
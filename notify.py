@@ -0,0 +1,111 @@
+"""In-process change notifier for live updates (/api/stream).
+
+One watcher thread per process stats the data generation file of each database that has
+subscribers (no SQLite, no per-client polling); bumps made in this process wake subscribers
+immediately. Subscribers block on a per-database condition, so idle ones cost a sleeping thread.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+from db import add_data_listener, data_generation, using_db
+
+# How often other processes' writes (workers, sync CLI, scheduler) are noticed
+WATCH_INTERVAL_SECONDS = 1.0
+
+
+def _stamp(path: str) -> tuple:
+    with using_db(path):
+        return data_generation()
+
+
+class ChangeNotifier:
+    def __init__(self, interval: float = WATCH_INTERVAL_SECONDS):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._conds: dict = {}  # path -> Condition (sharing _lock)
+        self._stamps: dict = {}  # path -> last seen data generation
+        self._subscribers: dict = {}  # path -> count
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_pid: Optional[int] = None
+
+    def subscribe(self, path) -> tuple:
+        """Start following a database; returns its current stamp for wait()."""
+        path = str(path)
+        self._ensure_watcher()
+        stamp = _stamp(path)
+        with self._lock:
+            self._subscribers[path] = self._subscribers.get(path, 0) + 1
+            self._conds.setdefault(path, threading.Condition(self._lock))
+            self._stamps.setdefault(path, stamp)
+            return self._stamps[path]
+
+    def unsubscribe(self, path) -> None:
+        path = str(path)
+        with self._lock:
+            n = self._subscribers.get(path, 0) - 1
+            if n > 0:
+                self._subscribers[path] = n
+                return
+            self._subscribers.pop(path, None)
+            self._conds.pop(path, None)
+            self._stamps.pop(path, None)
+
+    def wait(self, path, since: tuple, timeout: float) -> tuple:
+        """Block until the database's stamp differs from `since`, or timeout. Returns the current stamp."""
+        path = str(path)
+        with self._lock:
+            cond = self._conds.get(path)
+            if cond is None:
+                return since
+            cond.wait_for(lambda: self._stamps.get(path, since) != since, timeout)
+            return self._stamps.get(path, since)
+
+    def check(self, path) -> None:
+        """Re-read one database's stamp and wake its subscribers if it moved."""
+        path = str(path)
+        if path not in self._subscribers:
+            return
+        stamp = _stamp(path)
+        with self._lock:
+            cond = self._conds.get(path)
+            if cond is not None and self._stamps.get(path) != stamp:
+                self._stamps[path] = stamp
+                cond.notify_all()
+
+    def _watch(self) -> None:
+        while True:
+            for path in list(self._subscribers):
+                try:
+                    self.check(path)
+                except OSError:
+                    pass
+            time.sleep(self.interval)
+
+    def _ensure_watcher(self) -> None:
+        # Threads don't survive fork: each gunicorn worker starts its own watcher on first subscribe
+        if self._watcher is not None and self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher is not None and self._watcher_pid == os.getpid():
+                return
+            self._watcher = threading.Thread(target=self._watch, name="change-watcher", daemon=True)
+            self._watcher_pid = os.getpid()
+            self._watcher.start()
+
+    def _reset_after_fork(self) -> None:
+        # The parent's subscribers live in the parent; start clean with a fresh lock
+        self._lock = threading.Lock()
+        self._conds, self._stamps, self._subscribers = {}, {}, {}
+        self._watcher = None
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(self._subscribers.values())
+
+
+notifier = ChangeNotifier()
+add_data_listener(notifier.check)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=notifier._reset_after_fork)
@@ -1,9 +1,12 @@
 """Detect commitments in text and extract tasks, durations, conditions."""
 import re
+import time
 from dataclasses import dataclass
 from typing import Optional
 from datetime import date
 
+from metrics import PARSE_CALLS, PARSE_COMMITMENTS, PARSE_SECONDS
+
 
 @dataclass
 class Commitment:
@@ -140,6 +143,8 @@ PAST_EVENT_PATTERNS = [
     (re.compile(r"\bNNN\b", re.I), 11),
     (re.compile(r"\bDenial\s*December\b", re.I), 12),
 ]
+# Lowercase substrings that every PAST_EVENT_PATTERNS match contains (lets SQL skip the regex for most rows)
+PAST_EVENT_KEYWORDS = ("locktober", "november", "nnn", "december")
 
 
 def _is_past_time_bound_event(raw_text: str) -> bool:
@@ -160,6 +165,15 @@ def is_past_time_bound_event(raw_text: str) -> bool:
 
 def extract_commitments(text: str) -> list[Commitment]:
     """Parse a block of text (e.g. post body) and return list of Commitment objects."""
+    started = time.perf_counter()
+    commitments = _extract_commitments(text)
+    PARSE_CALLS.inc()
+    PARSE_COMMITMENTS.inc(len(commitments))
+    PARSE_SECONDS.inc(time.perf_counter() - started)
+    return commitments
+
+
+def _extract_commitments(text: str) -> list[Commitment]:
     if not text or not text.strip():
         return []
     commitments = []
@@ -0,0 +1,157 @@
+"""Opt-in profiling of live requests.
+
+A profiled run records a cProfile profile (.prof, for pstats or snakeviz) and samples its thread's
+stack every few milliseconds into collapsed stacks (.collapsed, for flamegraph.pl or speedscope),
+plus a .json summary. Files go to data/profiles/; only the newest PROFILE_KEEP runs are kept.
+
+Requests are profiled when PROFILE_SAMPLE_RATE (0-1) picks them, or on demand with an
+X-Profile: 1 header from an admin (see app.py), e.g. on POST /api/sync to profile one sync_tumblr
+run. Off by default. One run at a time per process (Python 3.12+ allows a single cProfile at once):
+a request that comes up while another is being profiled just runs unprofiled.
+"""
+import cProfile
+import io
+import json
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from config import DATA_DIR, PROFILE_KEEP
+
+PROFILE_DIR = DATA_DIR / "profiles"
+# Seconds between stack samples, and frames kept per sample (innermost)
+SAMPLE_INTERVAL = 0.005
+MAX_STACK_DEPTH = 64
+# Functions listed in each run's summary
+TOP_FUNCTIONS = 15
+
+_write_lock = threading.Lock()
+_run_lock = threading.Lock()  # held by the one Profile running in this process
+
+
+class _StackSampler(threading.Thread):
+    """Counts the collapsed stacks of one thread until stopped."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                names.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+class Profile:
+    """One profiled run: start(), then stop() and save()."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started_at = datetime.now().replace(microsecond=0).isoformat()
+        self.seconds = 0.0
+        self._profiler = cProfile.Profile()
+        self._sampler = _StackSampler(threading.get_ident())
+        self._t0 = 0.0
+
+    def start(self) -> Optional["Profile"]:
+        """Start profiling this thread. Returns None, having started nothing, when another run is
+        in progress or the interpreter refuses a second profiler."""
+        if not _run_lock.acquire(blocking=False):
+            return None
+        try:
+            self._profiler.enable()
+        except ValueError:  # another tool's profiler is active (3.12+)
+            _run_lock.release()
+            return None
+        self._t0 = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def stop(self) -> "Profile":
+        try:
+            self._profiler.disable()
+            self.seconds = time.perf_counter() - self._t0
+            self._sampler.stop()
+        finally:
+            _run_lock.release()
+        return self
+
+    def _top(self) -> list[dict]:
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (_cc, calls, tottime, cumtime, _callers) in stats.stats.items():
+            rows.append(
+                {
+                    "function": name if filename == "~" else f"{Path(filename).name}:{line}({name})",  # ~ = builtin
+                    "calls": calls,
+                    "tottime": round(tottime, 6),
+                    "cumtime": round(cumtime, 6),
+                }
+            )
+        rows.sort(key=lambda r: r["tottime"], reverse=True)
+        return rows[:TOP_FUNCTIONS]
+
+    def save(self, profile_dir: Path = PROFILE_DIR, keep: int = PROFILE_KEEP, **info) -> Path:
+        """Write .prof, .collapsed and .json for this run, then rotate. Returns the .json path."""
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_-]+", "_", self.label).strip("_")[:60] or "run"
+        stem = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{slug}"
+        self._profiler.dump_stats(str(profile_dir / f"{stem}.prof"))
+        collapsed = "".join(f"{stack} {n}\n" for stack, n in self._sampler.stacks.most_common())
+        (profile_dir / f"{stem}.collapsed").write_text(collapsed, encoding="utf-8")
+        summary = {
+            "name": stem,
+            "label": self.label,
+            "started_at": self.started_at,
+            "seconds": round(self.seconds, 6),
+            "samples": sum(self._sampler.stacks.values()),
+            "top": self._top(),
+            **info,
+        }
+        meta = profile_dir / f"{stem}.json"
+        meta.write_text(json.dumps(summary, indent=1), encoding="utf-8")
+        _rotate(profile_dir, keep)
+        return meta
+
+
+def _rotate(profile_dir: Path, keep: int) -> None:
+    with _write_lock:
+        runs = sorted(profile_dir.glob("*.json"), key=lambda p: p.name, reverse=True)
+        for old in runs[keep:]:
+            for suffix in (".prof", ".collapsed", ".json"):
+                old.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def list_profiles(profile_dir: Path = PROFILE_DIR, limit: Optional[int] = None) -> list[dict]:
+    """Saved run summaries, slowest first."""
+    if not profile_dir.is_dir():
+        return []
+    runs = []
+    for meta in profile_dir.glob("*.json"):
+        try:
+            runs.append(json.loads(meta.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue  # rotated away or half-written
+    runs.sort(key=lambda r: r.get("seconds", 0), reverse=True)
+    return runs[:limit] if limit else runs
@@ -0,0 +1,281 @@
+"""Reminder dispatcher: fires reminders when their next_due time arrives.
+
+Keeps a heap of the earliest-due reminders per database (a bounded window read through the
+(done, next_due) index, never the whole table, re-read after firing or when the database changes)
+and sleeps until the next one is due. Fired reminders go to pluggable sinks; recurring ones are
+advanced to their next occurrence and reopened (done = 0) if they were checked off, one-off ones are
+cleared. Reminders without a next_due are scheduled for today at at_time (HH:MM), or REMINDER_DEFAULT_TIME.
+
+Run one dispatcher per deployment (claims are atomic, so a second one never double-fires, it is just redundant):
+python scheduler.py                       # print fired reminders
+python scheduler.py --webhook https://...  # also POST them as JSON
+"""
+import argparse
+import heapq
+import json
+import threading
+import traceback
+import urllib.request
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from backup import all_db_paths
+from config import REMINDER_DEFAULT_TIME
+from db import bump_data_generation, data_generation, get_conn, init_db, now_iso, using_db
+
+# Earliest-due reminders held in memory per database; the next batch is read when these run out
+WINDOW_SIZE = 1000
+# Longest sleep between checks for new databases and reminders added by other processes
+MAX_SLEEP_SECONDS = 30.0
+
+_RECURRENCE_STEPS = {
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+
+Sink = Callable[[dict], None]
+
+
+# SQL that is true for reminders next_occurrence() advances rather than clears
+RECURRING_SQL = "lower(trim(COALESCE(recurrence, ''))) IN (" + ", ".join(f"'{r}'" for r in _RECURRENCE_STEPS) + ")"
+
+
+def _now() -> str:
+    return datetime.now().replace(microsecond=0).isoformat()
+
+
+def next_occurrence(due: str, recurrence: Optional[str], now: str) -> Optional[str]:
+    """The first occurrence after `now` for a recurring reminder last due at `due`; None if it doesn't recur.
+    Occurrences missed while nothing was running are skipped, not replayed."""
+    step = _RECURRENCE_STEPS.get((recurrence or "").strip().lower())
+    if step is None:
+        return None
+    t, now_dt = datetime.fromisoformat(due), datetime.fromisoformat(now)
+    if t <= now_dt:
+        t += step * ((now_dt - t) // step + 1)
+    return t.isoformat()
+
+
+def next_due_after_done(due: Optional[str], at_time: Optional[str], recurrence: Optional[str], now: str) -> Optional[str]:
+    """next_due for a reminder just checked off: None for a one-off. A recurring one skips the occurrence
+    that was pending (it is the one that got done) and waits for the following one, which clears done."""
+    if next_occurrence(now, recurrence, now) is None:
+        return None
+    if not due:
+        at = at_time if at_time and len(at_time) == 5 and at_time[2] == ":" else REMINDER_DEFAULT_TIME
+        due = f"{now[:10]}T{at}:00"
+    return next_occurrence(due, recurrence, max(due, now))
+
+
+# --- Sinks: called with {id, commitment_id, title, at_time, recurrence, due, fired_at, db} ---
+
+
+def log_sink(reminder: dict) -> None:
+    print(f"[reminder] {reminder['due']} {reminder['title']} ({reminder['db']})", flush=True)
+
+
+def make_webhook_sink(url: str, timeout: float = 5.0) -> Sink:
+    """POST each fired reminder as JSON to url."""
+
+    def sink(reminder: dict) -> None:
+        req = urllib.request.Request(
+            url, data=json.dumps(reminder).encode(), headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+
+    return sink
+
+
+def make_queue_sink(q) -> Sink:
+    """Put each fired reminder on q (a queue.Queue), for an in-process consumer."""
+    return q.put
+
+
+class ReminderScheduler:
+    """Heap of (next_due, db path, reminder id) across databases; one thread fires due reminders."""
+
+    def __init__(self, sinks: list[Sink], window: int = WINDOW_SIZE):
+        self.sinks = sinks
+        self.window = window
+        self._heap: list = []  # (due, path, reminder id, epoch)
+        self._epoch: dict = {}  # path -> bumped on reload; heap entries from older loads are skipped
+        self._stamps: dict = {}  # path -> data generation the window was loaded under
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.fired = 0
+
+    def _load(self, path: str) -> None:
+        """Schedule new reminders and (re)read the earliest-due window for one database."""
+        epoch = self._epoch.get(path, 0) + 1
+        self._epoch[path] = epoch
+        with using_db(path):
+            self._stamps[path] = data_generation()
+            conn = get_conn()
+            try:
+                cur = conn.cursor()
+                cur.execute(
+                    """UPDATE reminders
+                       SET next_due = date('now', 'localtime') || 'T' ||
+                           COALESCE(CASE WHEN at_time GLOB '[0-2][0-9]:[0-5][0-9]' THEN at_time END, ?) || ':00'
+                       WHERE done = 0 AND next_due IS NULL AND last_fired_at IS NULL""",
+                    (REMINDER_DEFAULT_TIME,),
+                )
+                scheduled = cur.rowcount
+                conn.commit()
+                # Open reminders, plus recurring ones done for now that reopen at their next occurrence
+                # (two reads of the (done, next_due) index)
+                cur.execute(
+                    """SELECT next_due, id FROM reminders WHERE done = 0 AND next_due IS NOT NULL
+                       ORDER BY next_due LIMIT ?""",
+                    (self.window,),
+                )
+                rows = cur.fetchall()
+                cur.execute(
+                    f"""SELECT next_due, id FROM reminders WHERE done = 1 AND next_due IS NOT NULL AND {RECURRING_SQL}
+                        ORDER BY next_due LIMIT ?""",
+                    (self.window,),
+                )
+                rows += cur.fetchall()
+            finally:
+                conn.close()
+            if scheduled:
+                bump_data_generation()
+                self._stamps[path] = data_generation()
+        for due, reminder_id in rows:
+            heapq.heappush(self._heap, (due, path, reminder_id, epoch))
+        # Drop dead entries now and then so reloads don't grow the heap without bound
+        if len(self._heap) > 4 * self.window * max(len(self._epoch), 1):
+            self._heap = [e for e in self._heap if self._epoch.get(e[1]) == e[3]]
+            heapq.heapify(self._heap)
+
+    def refresh(self) -> None:
+        """Reload databases that changed (or appeared) since their window was read."""
+        for path in map(str, all_db_paths()):
+            with using_db(path):
+                stamp = data_generation()
+            if self._stamps.get(path) != stamp:
+                self._load(path)
+
+    def _fire(self, path: str, due_ids: list, now: str) -> list[dict]:
+        """Claim due reminders in one transaction and advance them; returns the ones this process claimed."""
+        fired = []
+        with using_db(path):
+            conn = get_conn()
+            try:
+                cur = conn.cursor()
+                cur.execute("BEGIN IMMEDIATE")
+                for due, reminder_id in due_ids:
+                    cur.execute(
+                        f"""SELECT id, commitment_id, title, at_time, recurrence FROM reminders
+                            WHERE id = ? AND next_due = ? AND (done = 0 OR {RECURRING_SQL})""",
+                        (reminder_id, due),
+                    )
+                    row = cur.fetchone()
+                    if row is None:
+                        continue  # done, rescheduled or already fired elsewhere
+                    reminder = dict(zip(("id", "commitment_id", "title", "at_time", "recurrence"), row))
+                    # A new occurrence is open again, even if the last one was checked off
+                    cur.execute(
+                        "UPDATE reminders SET next_due = ?, last_fired_at = ?, done = 0 WHERE id = ?",
+                        (next_occurrence(due, reminder["recurrence"], now), now_iso(), reminder_id),
+                    )
+                    fired.append(dict(reminder, due=due, fired_at=now, db=path))
+                conn.commit()
+            finally:
+                conn.close()
+            if fired:
+                bump_data_generation()
+        return fired
+
+    def _dispatch(self, reminder: dict) -> None:
+        for sink in self.sinks:
+            try:
+                sink(reminder)
+            except Exception:
+                traceback.print_exc()
+
+    def run_pending(self, now: Optional[str] = None) -> int:
+        """Fire everything due at `now` (default: the current local time). Returns reminders fired."""
+        now = now or _now()
+        self.refresh()
+        count = 0
+        failed: set = set()
+        while True:
+            due: dict = {}
+            while self._heap and self._heap[0][0] <= now:
+                when, path, reminder_id, epoch = heapq.heappop(self._heap)
+                if self._epoch.get(path) == epoch and path not in failed:
+                    due.setdefault(path, []).append((when, reminder_id))
+            if not due:
+                break
+            for path, due_ids in due.items():
+                try:
+                    fired = self._fire(path, due_ids, now)
+                except Exception:
+                    traceback.print_exc()
+                    failed.add(path)
+                    self._stamps.pop(path, None)  # retried on the next run
+                    continue
+                for reminder in fired:
+                    self._dispatch(reminder)
+                count += len(fired)
+                # Refill the window; recurring reminders come back with a later next_due
+                self._load(path)
+        self.fired += count
+        return count
+
+    def seconds_until_next(self) -> float:
+        while self._heap and self._epoch.get(self._heap[0][1]) != self._heap[0][3]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return MAX_SLEEP_SECONDS
+        delta = (datetime.fromisoformat(self._heap[0][0]) - datetime.now()).total_seconds()
+        return min(max(delta, 0.0), MAX_SLEEP_SECONDS)
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                traceback.print_exc()
+            self._wake.wait(self.seconds_until_next())
+            self._wake.clear()
+
+    def wake(self) -> None:
+        """Re-check now (e.g. after adding reminders in this process)."""
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+
+def start_scheduler(sinks: Optional[list[Sink]] = None) -> ReminderScheduler:
+    """Run a dispatcher in a background thread. Returns it so callers can wake() or stop() it."""
+    scheduler = ReminderScheduler(sinks or [log_sink])
+    threading.Thread(target=scheduler.run_forever, name="reminder-scheduler", daemon=True).start()
+    return scheduler
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Fire reminders when they are due")
+    ap.add_argument("--webhook", help="also POST each fired reminder as JSON to this URL")
+    ap.add_argument("--once", action="store_true", help="fire what is due now and exit")
+    args = ap.parse_args(argv)
+    init_db()
+    sinks = [log_sink] + ([make_webhook_sink(args.webhook)] if args.webhook else [])
+    scheduler = ReminderScheduler(sinks)
+    if args.once:
+        print(f"{scheduler.run_pending()} reminder(s) fired")
+        return 0
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+"""Full-text search over Tumblr posts and commitments (FTS5 indexes created in db.py).
+
+Results are ranked by bm25 (newest-first when ranking would blow the time budget) and come back with matches wrapped in <mark>; the rest of the text is
+HTML-escaped, so snippets can be inserted as HTML. Without FTS5 it falls back to an unranked LIKE scan.
+"""
+import html
+import re
+import sqlite3
+import time
+from typing import Optional
+
+from db import get_conn
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Words of context around the first match in post snippets
+SNIPPET_TOKENS = 24
+
+# Ranking a term that matches a large share of the index can take far longer than a search should.
+# Past this budget the query is interrupted and re-run newest-first, which stops at `limit` matches.
+RANK_BUDGET_SECONDS = 0.05
+
+# Control characters as match markers: never in user text, swapped for <mark> after escaping
+_START, _END = "\x02", "\x03"
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+# Shortest last word treated as a prefix; shorter prefixes match too much of the index to rank quickly
+MIN_PREFIX_CHARS = 3
+
+
+def fts_query(q: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 query: every word must match, the last one as a prefix
+    (search-as-you-type) once it has MIN_PREFIX_CHARS. None when there are no words."""
+    terms = _TERM.findall(q)
+    if not terms:
+        return None
+    return " ".join(f'"{t}"' for t in terms) + ("*" if len(terms[-1]) >= MIN_PREFIX_CHARS else "")
+
+
+def _marked_html(text: Optional[str]) -> str:
+    escaped = html.escape(text or "")
+    return escaped.replace(_START, "<mark>").replace(_END, "</mark>")
+
+
+def _has_fts(cur) -> bool:
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'commitments_fts'")
+    return cur.fetchone() is not None
+
+
+def _ranked(cur, sql: str, params: tuple) -> tuple:
+    """Run `sql` (an FTS query with an {order} placeholder) by bm25 rank within RANK_BUDGET_SECONDS,
+    else newest-first. Returns (rows, ranked)."""
+    conn = cur.connection
+    deadline = time.perf_counter() + RANK_BUDGET_SECONDS
+    conn.set_progress_handler(lambda: time.perf_counter() > deadline, 10000)
+    try:
+        cur.execute(sql.format(order="f.rank"), params)
+        return cur.fetchall(), True
+    except sqlite3.OperationalError as e:
+        if "interrupted" not in str(e):
+            raise
+    finally:
+        conn.set_progress_handler(None, 0)
+    cur.execute(sql.format(order="f.rowid DESC"), params)
+    return cur.fetchall(), False
+
+
+def _search_posts(cur, match: str, limit: int) -> tuple:
+    rows, ranked = _ranked(
+        cur,
+        f"""SELECT f.post_id, p.blog_name, p.created_at,
+                   snippet(tumblr_posts_fts, 0, '{_START}', '{_END}', '…', {SNIPPET_TOKENS})
+            FROM tumblr_posts_fts f JOIN tumblr_posts p ON p.id = f.post_id
+            WHERE tumblr_posts_fts MATCH ? ORDER BY {{order}} LIMIT ?""",
+        (match, limit),
+    )
+    posts = [
+        {"id": pid, "blog_name": blog, "created_at": created, "snippet": _marked_html(snip)}
+        for pid, blog, created, snip in rows
+    ]
+    return posts, ranked
+
+
+def _search_commitments(cur, match: str, limit: int) -> tuple:
+    rows, ranked = _ranked(
+        cur,
+        f"""SELECT c.id, c.kind, c.status,
+                   highlight(commitments_fts, 0, '{_START}', '{_END}'),
+                   highlight(commitments_fts, 1, '{_START}', '{_END}')
+            FROM commitments_fts f JOIN commitments c ON c.id = f.rowid
+            WHERE commitments_fts MATCH ? ORDER BY {{order}} LIMIT ?""",
+        (match, limit),
+    )
+    commitments = [
+        {"id": cid, "kind": kind, "status": status, "raw_text": _marked_html(raw), "task_description": _marked_html(task)}
+        for cid, kind, status, raw, task in rows
+    ]
+    return commitments, ranked
+
+
+def _like_search(cur, terms: list, limit: int) -> tuple:
+    """Fallback without FTS5: every word as a substring, newest first, matches not highlighted."""
+    post_where = " AND ".join(["body_text LIKE ?"] * len(terms))
+    commitment_where = " AND ".join(["(raw_text LIKE ? OR task_description LIKE ?)"] * len(terms))
+    likes = [f"%{t}%" for t in terms]
+    cur.execute(
+        f"""SELECT id, blog_name, created_at, substr(body_text, 1, 200) FROM tumblr_posts
+            WHERE {post_where} ORDER BY created_at DESC LIMIT ?""",
+        likes + [limit],
+    )
+    posts = [
+        {"id": pid, "blog_name": blog, "created_at": created, "snippet": _marked_html(snip)}
+        for pid, blog, created, snip in cur.fetchall()
+    ]
+    cur.execute(
+        f"""SELECT id, kind, status, raw_text, task_description FROM commitments
+            WHERE {commitment_where} ORDER BY id DESC LIMIT ?""",
+        [like for like in likes for _ in (0, 1)] + [limit],
+    )
+    commitments = [
+        {"id": cid, "kind": kind, "status": status, "raw_text": _marked_html(raw), "task_description": _marked_html(task)}
+        for cid, kind, status, raw, task in cur.fetchall()
+    ]
+    return posts, commitments
+
+
+def search(q: str, kind: str = "all", limit: int = SEARCH_LIMIT) -> dict:
+    """Best matches for q among posts and/or commitments (kind: all|posts|commitments).
+    Returns {query, posts, commitments, ranked}; ranked is False when results are newest-first instead."""
+    if kind not in ("all", "posts", "commitments"):
+        raise ValueError("kind must be all, posts or commitments")
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    out = {"query": q, "posts": [], "commitments": [], "ranked": True}
+    match = fts_query(q)
+    if match is None:
+        return out
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        if not _has_fts(cur):
+            posts, commitments = _like_search(cur, _TERM.findall(q), limit)
+            out["ranked"] = False
+        else:
+            posts, posts_ranked = _search_posts(cur, match, limit) if kind != "commitments" else ([], True)
+            commitments, commitments_ranked = (
+                _search_commitments(cur, match, limit) if kind != "posts" else ([], True)
+            )
+            out["ranked"] = posts_ranked and commitments_ranked
+    finally:
+        conn.close()
+    out["posts"] = posts if kind != "commitments" else []
+    out["commitments"] = commitments if kind != "posts" else []
+    return out
@@ -1,10 +1,13 @@
 """Sync Tumblr posts -> DB, parse commitments -> reminders/schedules/counters/streaks."""
+import json
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 from config import TUMBLR_BLOG
-from db import get_conn, init_db, now_iso, get_setting, set_setting
-from parser import commitments_from_post_body, Commitment, is_past_time_bound_event
+from db import get_conn, init_db, now_iso, get_setting, set_setting, bump_data_generation, SOURCE_SQL, STATUS_SQL, sql_helper
+from metrics import record_sync
+from parser import commitments_from_post_body, Commitment, is_past_time_bound_event, PAST_EVENT_KEYWORDS
 from tumblr_client import fetch_posts
 
 # Only process posts from the last N days so old events (e.g. last year's Locktober) are skipped
@@ -152,6 +155,13 @@ def _sync_cooldown_key(blog: str) -> str:
 def sync_tumblr(blog: Optional[str] = None, max_posts: int = 500, force_fetch: bool = False) -> dict:
     """Fetch posts from Tumblr (or use cache if in cooldown), store, then process only unprocessed posts.
     Returns {posts_fetched, new_commitments, pending_review, errors, used_cache?, cooldown_until?}."""
+    started = time.perf_counter()
+    result = _sync_tumblr(blog, max_posts, force_fetch)
+    record_sync(result, time.perf_counter() - started)
+    return result
+
+
+def _sync_tumblr(blog: Optional[str], max_posts: int, force_fetch: bool) -> dict:
     init_db()
     blog = (blog or TUMBLR_BLOG or "").strip()
     if ".tumblr.com" in blog:
@@ -222,126 +232,219 @@ def sync_tumblr(blog: Optional[str] = None, max_posts: int = 500, force_fetch: b
         cur.execute("UPDATE tumblr_posts SET processed = 1 WHERE id = ?", (pid,))
     conn.commit()
     conn.close()
+    bump_data_generation()
     return result
 
 
+# Upper bound for one range generation call (keeps a typo'd year from inserting millions of rows)
+MAX_GENERATE_DAYS = 366
+
+
+def date_range(from_date: str, to_date: str, max_days: int) -> list[str]:
+    """Every YYYY-MM-DD from from_date to to_date inclusive. ValueError on bad dates, reversed or too-long ranges."""
+    start = datetime.strptime(from_date, "%Y-%m-%d").date()
+    end = datetime.strptime(to_date, "%Y-%m-%d").date()
+    if end < start:
+        raise ValueError("'to' must not be before 'from'")
+    n_days = (end - start).days + 1
+    if n_days > max_days:
+        raise ValueError(f"Range too long ({n_days} days, max {max_days})")
+    return [(start + timedelta(days=i)).isoformat() for i in range(n_days)]
+
+
+def _add_daily_summary(cur, rows) -> None:
+    """Add (date, commitment_id, items, completed) deltas to schedule_daily_summary."""
+    cur.executemany(
+        """INSERT INTO schedule_daily_summary (date, commitment_id, total_items, completed_items)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(date, commitment_id) DO UPDATE SET
+               total_items = total_items + excluded.total_items,
+               completed_items = completed_items + excluded.completed_items""",
+        rows,
+    )
+
+
 def generate_schedule_for_date(date_str: str) -> int:
     """Generate schedule rows for date from active daily commitments. Idempotent (INSERT OR IGNORE). Never touches done rows."""
-    conn = None
+    return generate_schedule_for_range(date_str, date_str).get(date_str, 0)
+
+
+def generate_schedule_for_range(from_date: str, to_date: str) -> dict:
+    """Generate schedule rows for every date in [from_date, to_date] (YYYY-MM-DD) in one INSERT ... SELECT.
+    Idempotent via the (date, title) unique index. Returns {date: inserted_count} for each day in the range."""
+    days = date_range(from_date, to_date, MAX_GENERATE_DAYS)
+    count_sql = """SELECT date, COALESCE(commitment_id, 0), COUNT(*) FROM schedule_items
+                   WHERE date BETWEEN ? AND ? GROUP BY date, COALESCE(commitment_id, 0)"""
+    conn = get_conn()
     try:
-        conn = get_conn()
         cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(count_sql, (days[0], days[-1]))
+        before = {(d, cid): n for d, cid, n in cur.fetchall()}
         cur.execute(
-            """SELECT id, commitment_id, title, notes FROM schedule_items si
+            """WITH RECURSIVE days(d) AS (
+                   SELECT ? UNION ALL SELECT date(d, '+1 day') FROM days WHERE d < ?
+               )
+               INSERT OR IGNORE INTO schedule_items (commitment_id, date, title, notes, completed, created_at)
+               SELECT si.commitment_id, days.d, si.title, COALESCE(si.notes, ''), 0, ?
+               FROM days
+               CROSS JOIN schedule_items si
                JOIN commitments c ON c.id = si.commitment_id AND COALESCE(c.status, 'active') = 'active'
-               WHERE si.date = ''"""
+               WHERE si.date = ''
+               ORDER BY days.d, si.id""",
+            (days[0], days[-1], now_iso()),
         )
-        templates = cur.fetchall()
-        inserted = 0
-        for row in templates:
-            cur.execute(
-                """INSERT OR IGNORE INTO schedule_items (commitment_id, date, title, notes, completed, created_at)
-                   VALUES (?, ?, ?, ?, 0, ?)""",
-                (row[1], date_str, row[2], row[3] or "", now_iso()),
-            )
-            if cur.rowcount:
-                inserted += 1
+        cur.execute(count_sql, (days[0], days[-1]))
+        added = [(d, cid, n - before.get((d, cid), 0), 0) for d, cid, n in cur.fetchall()]
+        added = [row for row in added if row[2]]
+        _add_daily_summary(cur, added)
         conn.commit()
-        return inserted
-    except Exception:
-        raise
     finally:
-        if conn is not None:
-            try:
-                conn.close()
-            except Exception:
-                pass
+        conn.close()
+    inserted = dict.fromkeys(days, 0)
+    for d, _cid, n, _completed in added:
+        inserted[d] += n
+    if any(inserted.values()):
+        bump_data_generation()
+    return inserted
+
+
+def _past_event_candidate_sql(column: str) -> str:
+    """SQL that is true when `column` might name a time-bound event; a cheap LIKE prefilter for is_past_time_bound_event."""
+    return "(" + " OR ".join(f"{column} LIKE '%{kw}%'" for kw in PAST_EVENT_KEYWORDS) + ")"
+
+
+_MAYBE_PAST_EVENT = _past_event_candidate_sql("c.raw_text")
+
+
+@sql_helper
+def _fetch_visible(cur, sql: str, params=(), limit: Optional[int] = None) -> list[dict]:
+    """Run a getter query whose last column is maybe_past_event; return row dicts minus past time-bound events.
+    Uses plain tuples zipped into dicts (much cheaper than sqlite3.Row -> dict on big schedules), and only
+    rows flagged by the SQL prefilter pay for the regex check. With `limit`, stops stepping the query once
+    limit + 1 visible rows are in (the extra one tells the caller there is more)."""
+    c = cur.connection.cursor()
+    c.row_factory = None
+    c.execute(sql, params)
+    names = [d[0] for d in c.description][:-1]  # zip() stops before the trailing flag column
+    raw_idx = names.index("raw_text")
+    out = []
+    for row in c.fetchall() if limit is None else c:
+        if row[-1] and is_past_time_bound_event(row[raw_idx] or ""):
+            continue
+        out.append(dict(zip(names, row)))
+        if limit is not None and len(out) > limit:
+            break
+    return out
 
 
-def get_schedule_items_for_date(date: str):
-    """Get schedule items that apply to a given date (YYYY-MM-DD). Only from active commitments; hide past time-bound events (e.g. Locktober)."""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """SELECT si.id, si.commitment_id, si.date, si.title, si.notes, si.completed, c.raw_text
-           FROM schedule_items si
-           JOIN commitments c ON c.id = si.commitment_id AND c.status = 'active'
-           WHERE (si.date = ? OR si.date = '') ORDER BY si.id""",
+def _schedule_items_for_date(cur, date: str) -> list[dict]:
+    return _fetch_visible(
+        cur,
+        f"""SELECT si.id, si.commitment_id, si.date, si.title, si.notes, si.completed, c.raw_text,
+                   {_MAYBE_PAST_EVENT} AS maybe_past_event
+            FROM schedule_items si
+            JOIN commitments c ON c.id = si.commitment_id AND c.status = 'active'
+            WHERE (si.date = ? OR si.date = '') ORDER BY si.id""",
         (date,),
     )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return [r for r in rows if not is_past_time_bound_event(r.get("raw_text") or "")]
 
 
-def get_reminders_today():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """SELECT r.id, r.commitment_id, r.title, r.at_time, r.recurrence, r.next_due, r.done, c.raw_text
-           FROM reminders r JOIN commitments c ON c.id = r.commitment_id AND c.status = 'active'
-           WHERE r.done = 0 ORDER BY r.id"""
+def _schedule_page(cur, date: str, after: int, limit: int) -> tuple:
+    """(rows, next) for one page of a day's schedule: up to `limit` rows with id > after, in id order, the
+    same rows _schedule_items_for_date returns. next is the `after` for the following page, None on the last.
+    Dated rows and daily templates each walk idx_si_date in id order and SQLite merges the two, so a page
+    costs the same however many items the day has."""
+    part = f"""SELECT si.id, si.commitment_id, si.date, si.title, si.notes, si.completed, c.raw_text,
+                      {_MAYBE_PAST_EVENT} AS maybe_past_event
+               FROM schedule_items si
+               JOIN commitments c ON c.id = si.commitment_id AND c.status = 'active'
+               WHERE si.date = ? AND si.id > ?"""
+    rows = _fetch_visible(cur, f"{part} UNION ALL {part} ORDER BY 1", (date, after, "", after), limit=limit)
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]["id"]
+    return rows, None
+
+
+def _reminders_today(cur) -> list[dict]:
+    return _fetch_visible(
+        cur,
+        f"""SELECT r.id, r.commitment_id, r.title, r.at_time, r.recurrence, r.next_due, r.done, c.raw_text,
+                   {_MAYBE_PAST_EVENT} AS maybe_past_event
+            FROM reminders r JOIN commitments c ON c.id = r.commitment_id AND c.status = 'active'
+            WHERE r.done = 0 ORDER BY r.id""",
     )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return [r for r in rows if not is_past_time_bound_event(r.get("raw_text") or "")]
 
 
-def get_counters():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """SELECT co.id, co.commitment_id, co.name, co.current_value, co.target_value, co.unit, co.start_date, co.last_updated, c.raw_text
-           FROM counters co JOIN commitments c ON c.id = co.commitment_id AND c.status = 'active'
-           ORDER BY co.id"""
+def _counters(cur) -> list[dict]:
+    return _fetch_visible(
+        cur,
+        f"""SELECT co.id, co.commitment_id, co.name, co.current_value, co.target_value, co.unit, co.start_date,
+                   co.last_updated, c.raw_text, {_MAYBE_PAST_EVENT} AS maybe_past_event
+            FROM counters co JOIN commitments c ON c.id = co.commitment_id AND c.status = 'active'
+            ORDER BY co.id""",
     )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return [r for r in rows if not is_past_time_bound_event(r.get("raw_text") or "")]
 
 
-def get_streaks():
-    """Streaks from streaks table (legacy) plus commitment-based. Hide past time-bound events (e.g. Locktober)."""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """SELECT s.id, s.commitment_id, s.name, s.current_streak, s.longest_streak, s.last_activity_date, c.raw_text
-           FROM streaks s JOIN commitments c ON c.id = s.commitment_id AND c.status = 'active'
-           ORDER BY s.id"""
+def _streaks(cur) -> list[dict]:
+    """Commitment-based streaks, then legacy streaks-table rows for commitments that have none, in one query."""
+    return _fetch_visible(
+        cur,
+        f"""SELECT c.id AS id, c.id AS commitment_id, c.task_description AS name, c.current_streak,
+                   c.best_streak AS longest_streak, c.last_completed_date AS last_activity_date, c.raw_text,
+                   NULL AS streak_id, {_MAYBE_PAST_EVENT} AS maybe_past_event
+            FROM commitments c
+            WHERE c.status = 'active' AND (c.current_streak > 0 OR c.last_completed_date IS NOT NULL)
+            UNION ALL
+            SELECT * FROM (
+                SELECT s.id, s.commitment_id, s.name, s.current_streak, s.longest_streak, s.last_activity_date,
+                       c.raw_text, s.id AS streak_id, {_MAYBE_PAST_EVENT} AS maybe_past_event
+                FROM streaks s JOIN commitments c ON c.id = s.commitment_id AND c.status = 'active'
+                WHERE NOT (COALESCE(c.current_streak, 0) > 0 OR c.last_completed_date IS NOT NULL)
+                ORDER BY s.id
+            )""",
     )
-    legacy = [dict(r) for r in cur.fetchall()]
-    legacy = [r for r in legacy if not is_past_time_bound_event(r.get("raw_text") or "")]
-    for row in legacy:
-        row["streak_id"] = row["id"]
-    cur.execute(
-        """SELECT id AS commitment_id, task_description AS name, current_streak, best_streak AS longest_streak, last_completed_date AS last_activity_date, raw_text
-           FROM commitments WHERE status = 'active' AND (current_streak > 0 OR last_completed_date IS NOT NULL)"""
+
+
+def _punishment_triggers(cur) -> list[dict]:
+    return _fetch_visible(
+        cur,
+        f"""SELECT pt.id, pt.commitment_id, pt.condition_text, pt.action_text, pt.active, c.raw_text,
+                   {_MAYBE_PAST_EVENT} AS maybe_past_event
+            FROM punishment_triggers pt JOIN commitments c ON c.id = pt.commitment_id AND c.status = 'active'
+            WHERE pt.active = 1""",
     )
-    from_commitments = [dict(r) for r in cur.fetchall()]
-    from_commitments = [r for r in from_commitments if not is_past_time_bound_event(r.get("raw_text") or "")]
-    seen_cid = {row["commitment_id"] for row in from_commitments}
-    for row in legacy:
-        if row["commitment_id"] not in seen_cid:
-            from_commitments.append(row)
-    for row in from_commitments:
-        if "streak_id" not in row:
-            row["id"] = row["commitment_id"]
-            row["streak_id"] = None
-    conn.close()
-    return from_commitments
 
 
-def get_punishment_triggers():
+@sql_helper
+def _read(fetch, *args):
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """SELECT pt.id, pt.commitment_id, pt.condition_text, pt.action_text, pt.active, c.raw_text
-           FROM punishment_triggers pt JOIN commitments c ON c.id = pt.commitment_id AND c.status = 'active'
-           WHERE pt.active = 1"""
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return [r for r in rows if not is_past_time_bound_event(r.get("raw_text") or "")]
+    try:
+        return fetch(conn.cursor(), *args)
+    finally:
+        conn.close()
+
+
+def get_schedule_items_for_date(date: str):
+    """Get schedule items that apply to a given date (YYYY-MM-DD). Only from active commitments; hide past time-bound events (e.g. Locktober)."""
+    return _read(_schedule_items_for_date, date)
+
+
+def get_reminders_today():
+    return _read(_reminders_today)
+
+
+def get_counters():
+    return _read(_counters)
+
+
+def get_streaks():
+    """Streaks from streaks table (legacy) plus commitment-based. Hide past time-bound events (e.g. Locktober)."""
+    return _read(_streaks)
+
+
+def get_punishment_triggers():
+    return _read(_punishment_triggers)
 
 
 def get_pending_commitments():
@@ -365,6 +468,8 @@ def set_commitment_status(commitment_id: int, status: str) -> bool:
     conn.commit()
     ok = cur.rowcount > 0
     conn.close()
+    if ok:
+        bump_data_generation()
     return ok
 
 
@@ -374,42 +479,121 @@ def set_commitment_status_bulk(ids: list[int], status: str) -> int:
         return 0
     conn = get_conn()
     cur = conn.cursor()
-    placeholders = ",".join("?" * len(ids))
-    cur.execute(f"UPDATE commitments SET status = ? WHERE id IN ({placeholders})", [status] + ids)
+    # One JSON parameter instead of one placeholder per id: no variable limit on large selections
+    cur.execute(
+        "UPDATE commitments SET status = ? WHERE id IN (SELECT value FROM json_each(?))",
+        (status, json.dumps([int(i) for i in ids])),
+    )
     conn.commit()
     n = cur.rowcount
     conn.close()
+    if n:
+        bump_data_generation()
     return n
 
 
+# Rows per Manage page / /api/commitments call
+MANAGE_PAGE_SIZE = 50
+MAX_MANAGE_PAGE_SIZE = 500
+
+def commitment_filter_sql(
+    source_filter: Optional[str] = None,
+    status_filter: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    blog: Optional[str] = None,
+    older_than_days: Optional[int] = None,
+) -> tuple:
+    """(WHERE clause, params) for the Manage filters: source tumblr|import, status active|rejected|pending,
+    confidence >= min_confidence, posts from one Tumblr blog, created more than older_than_days ago."""
+    clauses, params = ["1=1"], []
+    if source_filter in ("tumblr", "import"):
+        clauses.append(f"{SOURCE_SQL} = ?")
+        params.append(source_filter)
+    if status_filter and status_filter != "all":
+        clauses.append(f"{STATUS_SQL} = ?")
+        params.append(status_filter)
+    if min_confidence is not None:
+        clauses.append("confidence >= ?")
+        params.append(min_confidence)
+    if blog:
+        clauses.append("source_post_id IN (SELECT id FROM tumblr_posts WHERE blog_name = ?)")
+        params.append(blog)
+    if older_than_days is not None:
+        # created_at is stored as now_iso() (UTC, ...Z), so the cutoff is formatted the same way
+        clauses.append("created_at < strftime('%Y-%m-%dT%H:%M:%SZ', 'now', ?)")
+        params.append(f"-{int(older_than_days)} days")
+    return " AND ".join(clauses), params
+
+
+def set_commitment_status_matching(status: str, filters: dict, dry_run: bool = False) -> int:
+    """Set status on every commitment matching filters (commitment_filter_sql kwargs) in one UPDATE.
+    Rows already at that status are left alone. Returns rows changed, or with dry_run the rows that would be."""
+    if status not in ("active", "rejected"):
+        return 0
+    where, params = commitment_filter_sql(**filters)
+    where += f" AND {STATUS_SQL} != ?"
+    params.append(status)
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        if dry_run:
+            cur.execute(f"SELECT COUNT(*) FROM commitments WHERE {where}", params)
+            return cur.fetchone()[0]
+        cur.execute(f"UPDATE commitments SET status = ? WHERE {where}", [status] + params)
+        conn.commit()
+        n = cur.rowcount
+    finally:
+        conn.close()
+    if n:
+        bump_data_generation()
+    return n
+
+
+def get_commitments_page(
+    source_filter: Optional[str] = None,
+    status_filter: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = MANAGE_PAGE_SIZE,
+    **filters,
+) -> dict:
+    """One page of commitments, newest first, with id < before_id (keyset pagination).
+    Extra filters are passed to commitment_filter_sql.
+    Returns {commitments, next_before}; next_before is None on the last page."""
+    limit = max(1, min(limit, MAX_MANAGE_PAGE_SIZE))
+    where, params = commitment_filter_sql(source_filter, status_filter, **filters)
+    if before_id is not None:
+        where += " AND id < ?"
+        params.append(before_id)
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        f"""SELECT id, raw_text, kind, status, source_post_id, created_at,
+                   CASE {SOURCE_SQL} WHEN 'tumblr' THEN 'Tumblr' ELSE 'Import' END AS source_label
+            FROM commitments WHERE {where} ORDER BY id DESC LIMIT ?""",
+        params + [limit + 1],
+    )
+    rows = [dict(r) for r in cur.fetchall()]
+    conn.close()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {"commitments": rows, "next_before": rows[-1]["id"] if more else None}
+
+
 def get_all_commitments_for_manage(
     source_filter: Optional[str] = None,
     status_filter: Optional[str] = None,
 ):
-    """All commitments for the Manage page, optionally filtered by source (tumblr|import) and status (active|rejected|pending)."""
+    """All commitments for the Manage page, optionally filtered by source (tumblr|import) and status (active|rejected|pending).
+    Unbounded; the page itself uses get_commitments_page."""
     conn = get_conn()
     cur = conn.cursor()
-    sql = """SELECT id, raw_text, kind, status, source_post_id, created_at
-             FROM commitments WHERE 1=1"""
-    params: list = []
-    if source_filter == "tumblr":
-        sql += " AND source_post_id IS NOT NULL AND source_post_id != '' AND source_post_id NOT LIKE 'import:%'"
-    elif source_filter == "import":
-        sql += " AND (source_post_id IS NULL OR source_post_id = '' OR source_post_id LIKE 'import:%')"
-    if status_filter and status_filter != "all":
-        if status_filter == "pending":
-            sql += " AND (status IS NULL OR status = 'pending')"
-        else:
-            sql += " AND status = ?"
-            params.append(status_filter)
-    sql += " ORDER BY id DESC"
-    cur.execute(sql, params)
-    rows = cur.fetchall()
+    where, params = commitment_filter_sql(source_filter, status_filter)
+    cur.execute(
+        f"""SELECT id, raw_text, kind, status, source_post_id, created_at,
+                   CASE {SOURCE_SQL} WHEN 'tumblr' THEN 'Tumblr' ELSE 'Import' END AS source_label
+            FROM commitments WHERE {where} ORDER BY id DESC""",
+        params,
+    )
+    rows = [dict(r) for r in cur.fetchall()]
     conn.close()
-    out = []
-    for r in rows:
-        d = dict(r)
-        src = (d.get("source_post_id") or "")
-        d["source_label"] = "Tumblr" if src and not src.startswith("import:") else "Import"
-        out.append(d)
-    return out
+    return rows
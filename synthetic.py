@@ -0,0 +1,274 @@
+"""Synthetic data for scale testing: fills a database with posts, commitments of every kind, their
+reminders, counters, streaks and punishment triggers, and months of schedule history and activity.
+
+Rows are consistent with what the app itself would have written: schedule summaries match the items,
+streaks match the completed days, counters match their increment events. Everything is inserted with
+executemany in one transaction per table, so a million rows take seconds.
+
+python synthetic.py /tmp/scale.db --commitments 100000 --days 120
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+from db import bump_data_generation, get_conn, init_db, now_iso, using_db
+
+DEFAULT_COMMITMENTS = 10000
+DEFAULT_DAYS = 90
+# Share of commitments per kind
+KIND_WEIGHTS = {"schedule": 40, "reminder": 15, "counter": 15, "streak": 15, "punishment": 15}
+# Share of commitments that come from pasted text rather than a Tumblr post
+IMPORT_SHARE = 0.2
+
+BLOGS = [f"{a}{b}" for a in ("velvet", "lilac", "obedient", "sunny", "quiet", "brat", "good", "kitten")
+         for b in ("girl", "pet", "diary", "rules", "days", "notes")]
+TASKS = [
+    "morning stretch", "20 squats", "read for 15 minutes", "journal", "cold shower", "plank for 2 minutes",
+    "walk 5k", "meditate", "drink 2 litres of water", "tidy the room", "practice posture", "write lines",
+    "skincare routine", "study for an hour", "no phone after 22:00", "edge", "yoga", "floss",
+]
+CONDITIONS = ["you skip a task", "you break a rule", "you are late", "you forget to report", "you miss a day"]
+ACTIONS = ["add 3 days", "no treat", "write 100 lines", "early bedtime", "corner time", "double tasks tomorrow"]
+FILLER = [
+    "Another week of rules.", "Thank you for all the messages!", "Poll results are in.", "Checking in.",
+    "Feeling good about this one.", "Here is the plan.", "Keep me honest.", "Day went well.",
+]
+
+
+def _kind_text(rng: random.Random, kind: str, n: int) -> dict:
+    """raw_text and parsed fields for one commitment; n keeps the text unique within its post."""
+    task = rng.choice(TASKS)
+    if kind == "schedule":
+        return {"raw_text": f"Daily: {task} (set {n})", "task_description": task, "duration_days": rng.randint(7, 60)}
+    if kind == "reminder":
+        at_time = f"{rng.randint(6, 22):02d}:{rng.choice((0, 15, 30, 45)):02d}"
+        return {"raw_text": f"Remind me to {task} at {at_time} (note {n})", "task_description": task, "at_time": at_time}
+    if kind == "counter":
+        days = rng.choice((3, 5, 7, 10, 14, 30))
+        return {"raw_text": f"Poll winner = {days} days locked (round {n})", "task_description": "days locked",
+                "duration_days": days}
+    if kind == "streak":
+        days = rng.choice((5, 7, 14, 30, 60))
+        return {"raw_text": f"Streak: {days} days of {task} (goal {n})", "task_description": task, "duration_days": days}
+    condition = rng.choice(CONDITIONS)
+    return {"raw_text": f"If {condition}, then {rng.choice(ACTIONS)} (rule {n})", "task_description": "",
+            "condition_text": condition}
+
+
+def make_posts(count: int, seed: int = 1, blog: str = "synthetic", prefix: str = "syn") -> list[dict]:
+    """Posts shaped like tumblr_client.fetch_posts() results, dated today, for replaying through sync_tumblr."""
+    rng = random.Random(seed)
+    kinds, weights = list(KIND_WEIGHTS), list(KIND_WEIGHTS.values())
+    created = date.today().isoformat() + " 12:00:00 GMT"
+    posts = []
+    for i in range(count):
+        lines = [rng.choice(FILLER)]
+        lines += [_kind_text(rng, rng.choices(kinds, weights)[0], n)["raw_text"] + "." for n in range(rng.randint(1, 4))]
+        posts.append({"id": f"{prefix}{i}", "blog_name": blog, "body_text": "\n".join(lines), "created_at": created})
+    return posts
+
+
+def _next_ids(cur) -> dict:
+    ids = {}
+    for table in ("commitments", "reminders", "schedule_items", "counters", "streaks", "punishment_triggers", "activity_log"):
+        cur.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+        ids[table] = cur.fetchone()[0]
+    return ids
+
+
+def _day_runs(dates: list) -> list:
+    """Streak length on each date of a sorted list of completed dates (consecutive days extend it)."""
+    runs, prev, current = [], None, 0
+    for d in dates:
+        current = current + 1 if prev is not None and (d - prev).days == 1 else 1
+        runs.append(current)
+        prev = d
+    return runs
+
+
+def generate(
+    commitments: int = DEFAULT_COMMITMENTS,
+    days: int = DEFAULT_DAYS,
+    seed: int = 1,
+    today: Optional[date] = None,
+) -> dict:
+    """Add synthetic data to the current database. Returns rows inserted per table."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    created = now_iso()
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        ids = _next_ids(cur)
+        rows: dict = {t: [] for t in (
+            "tumblr_posts", "commitments", "reminders", "schedule_items", "schedule_daily_summary",
+            "counters", "streaks", "punishment_triggers", "activity_log",
+        )}
+        kinds, weights = list(KIND_WEIGHTS), list(KIND_WEIGHTS.values())
+        made = 0
+        while made < commitments:
+            # One post (or pasted import) carrying 1-4 commitments
+            per_post = min(rng.randint(1, 4), commitments - made)
+            posted = today - timedelta(days=rng.randint(0, days))
+            # Named after the post's first commitment id, so --append never reuses one
+            if rng.random() < IMPORT_SHARE:
+                source, blog = f"import:synthetic-{ids['commitments']}", None
+            else:
+                source, blog = f"synthetic-{ids['commitments']}", rng.choice(BLOGS)
+            lines = [rng.choice(FILLER)]
+            for n in range(per_post):
+                kind = rng.choices(kinds, weights)[0]
+                fields = _kind_text(rng, kind, n)
+                lines.append(fields["raw_text"] + ".")
+                cid = ids["commitments"]
+                ids["commitments"] += 1
+                made += 1
+                confidence = round(rng.uniform(0.55, 0.98), 2)
+                status = rng.choices(("active", "pending", "rejected"), (80, 12, 8))[0] if confidence < 0.8 else "active"
+                history = _derive(rng, rows, ids, cid, kind, fields, posted, today, created) if status == "active" else {}
+                rows["commitments"].append((
+                    cid, source, fields["raw_text"], kind, fields.get("task_description", ""),
+                    fields.get("duration_days"), fields.get("condition_text"), posted.isoformat() + "T12:00:00Z",
+                    status, confidence, history.get("current", 0), history.get("best", 0), history.get("last"),
+                ))
+            if blog is not None:
+                rows["tumblr_posts"].append(
+                    (source, blog, " ".join(lines), posted.isoformat() + " 12:00:00 GMT", created, 1)
+                )
+
+        cur.execute("BEGIN")
+        inserts = {
+            "tumblr_posts": "INSERT INTO tumblr_posts (id, blog_name, body_text, created_at, fetched_at, processed) VALUES (?, ?, ?, ?, ?, ?)",
+            "commitments": """INSERT INTO commitments (id, source_post_id, raw_text, kind, task_description, duration_days,
+                                  condition_text, created_at, status, confidence, current_streak, best_streak, last_completed_date)
+                              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            "reminders": """INSERT INTO reminders (id, commitment_id, title, at_time, recurrence, next_due, done, created_at)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            "schedule_items": "INSERT INTO schedule_items (id, commitment_id, date, title, notes, completed, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            "schedule_daily_summary": """INSERT INTO schedule_daily_summary (date, commitment_id, total_items, completed_items, current_streak)
+                                         VALUES (?, ?, ?, ?, ?)""",
+            "counters": """INSERT INTO counters (id, commitment_id, name, current_value, target_value, unit, start_date, last_updated, created_at)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            "streaks": """INSERT INTO streaks (id, commitment_id, name, current_streak, longest_streak, last_activity_date, created_at)
+                          VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            "punishment_triggers": """INSERT INTO punishment_triggers (id, commitment_id, condition_text, action_text, active, created_at)
+                                      VALUES (?, ?, ?, ?, ?, ?)""",
+            "activity_log": """INSERT INTO activity_log (commitment_id, action_type, target_id, amount, date, notes, created_at)
+                               VALUES (?, ?, ?, ?, ?, NULL, ?)""",
+        }
+        for table, sql in inserts.items():
+            cur.executemany(sql, rows[table])
+        conn.commit()
+    finally:
+        conn.rollback()
+        conn.close()
+    bump_data_generation()
+    return {table: len(r) for table, r in rows.items()}
+
+
+def _derive(rng, rows, ids, cid, kind, fields, posted: date, today: date, created: str) -> dict:
+    """Queue the derived rows and history of one active commitment. Returns its commitment streak fields."""
+    task = fields.get("task_description") or fields["raw_text"][:80]
+    activity = rows["activity_log"]
+    if kind == "schedule":
+        start = posted
+        end = min(today, start + timedelta(days=fields["duration_days"] - 1))
+        diligence = rng.uniform(0.4, 0.97)
+        title = f"{task} #{cid}"  # (date, title) is unique
+        # The dateless template row generate_schedule_for_range expands, then the days already expanded
+        rows["schedule_items"].append((ids["schedule_items"], cid, "", title, fields["raw_text"], 0, created))
+        ids["schedule_items"] += 1
+        done_days = []
+        d = start
+        while d <= end:
+            item_id = ids["schedule_items"]
+            ids["schedule_items"] += 1
+            completed = 1 if d < today and rng.random() < diligence else 0
+            rows["schedule_items"].append((item_id, cid, d.isoformat(), title, fields["raw_text"], completed, created))
+            if completed:
+                done_days.append(d)
+                activity.append((cid, "schedule_done", item_id, 1, d.isoformat(), created))
+                activity.append((cid, "commitment_day_done", cid, 1, d.isoformat(), created))
+            d += timedelta(days=1)
+        runs = dict(zip(done_days, _day_runs(done_days)))
+        d = start
+        while d <= end:
+            done = d in runs
+            rows["schedule_daily_summary"].append((d.isoformat(), cid, 1, 1 if done else 0, runs.get(d)))
+            d += timedelta(days=1)
+        if not done_days:
+            return {}
+        return {"current": runs[done_days[-1]], "best": max(runs.values()), "last": done_days[-1].isoformat()}
+    if kind == "reminder":
+        rid = ids["reminders"]
+        ids["reminders"] += 1
+        done = 1 if rng.random() < 0.3 else 0
+        recurrence = rng.choice(("daily", "weekly", None))
+        # A checked-off recurring reminder waits for its next occurrence (see scheduler.next_due_after_done)
+        next_due = f"{today + timedelta(days=1)}T{fields['at_time']}:00" if done and recurrence else None
+        rows["reminders"].append((rid, cid, task, fields["at_time"], recurrence, next_due, done, created))
+        if done:
+            activity.append((cid, "reminder_done", rid, 1, today.isoformat(), created))
+    elif kind == "counter":
+        counter_id = ids["counters"]
+        ids["counters"] += 1
+        value, d = 0, posted
+        while d <= today:
+            if rng.random() < 0.6:
+                value += 1
+                activity.append((cid, "counter_increment", counter_id, 1, d.isoformat(), created))
+            d += timedelta(days=1)
+        rows["counters"].append(
+            (counter_id, cid, "days", value, fields["duration_days"], "days", posted.isoformat(), created, created)
+        )
+    elif kind == "streak":
+        streak_id = ids["streaks"]
+        ids["streaks"] += 1
+        logged = []
+        d = posted
+        while d <= today:
+            if rng.random() < 0.75:
+                logged.append(d)
+                activity.append((cid, "streak_log", streak_id, 1, d.isoformat(), created))
+            d += timedelta(days=1)
+        runs = _day_runs(logged)
+        rows["streaks"].append((
+            streak_id, cid, task, runs[-1] if runs else 0, max(runs, default=0),
+            logged[-1].isoformat() if logged else None, created,
+        ))
+    else:
+        trigger_id = ids["punishment_triggers"]
+        ids["punishment_triggers"] += 1
+        action = fields["raw_text"].split(", then ", 1)[1].rsplit(" (", 1)[0]
+        rows["punishment_triggers"].append((trigger_id, cid, fields["condition_text"], action, 1, created))
+    return {}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Fill a database with synthetic data for scale testing")
+    ap.add_argument("db", help="database file to fill (created if missing)")
+    ap.add_argument("--commitments", type=int, default=DEFAULT_COMMITMENTS)
+    ap.add_argument("--days", type=int, default=DEFAULT_DAYS, help="days of history before today")
+    ap.add_argument("--seed", type=int, default=1, help="random seed (same seed, same data)")
+    ap.add_argument("--append", action="store_true", help="add to a database that already has commitments")
+    args = ap.parse_args(argv)
+    with using_db(Path(args.db).resolve()):
+        init_db()
+        conn = get_conn()
+        existing = conn.execute("SELECT COUNT(*) FROM commitments").fetchone()[0]
+        conn.close()
+        if existing and not args.append:
+            print(f"{args.db} already has {existing} commitment(s); pass --append to add to it anyway")
+            return 1
+        started = time.perf_counter()
+        counts = generate(args.commitments, args.days, args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"Inserted {sum(counts.values())} rows in {elapsed:.1f} s: " + ", ".join(f"{n} {t}" for t, n in counts.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
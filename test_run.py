@@ -1,4 +1,6 @@
 """Quick verification: imports, DB init, parser, import flow, and API data shape."""
+import json
+import re
 import sys
 from datetime import date
 
@@ -19,6 +21,17 @@ def test_db():
     conn = get_conn()
     conn.execute("SELECT 1")
     conn.close()
+    # Rotating user "foo"'s snapshots leaves user "foo-2024"'s alone
+    import tempfile
+    from pathlib import Path
+    from backup import _rotate
+    with tempfile.TemporaryDirectory() as tmp:
+        names = ["foo-20261001T000000000000Z.db.gz", "foo-20261002T000000000000Z.db.gz",
+                 "foo-2024-20261001T000000000000Z.db.gz"]
+        for name in names:
+            (Path(tmp) / name).touch()
+        _rotate(Path(tmp), "foo", 1)
+        assert sorted(p.name for p in Path(tmp).iterdir()) == sorted(names[1:])
     print("OK")
 
 def test_parser():
@@ -44,14 +57,241 @@ def test_today_brief():
     assert "schedule" in data and "reminders" in data and "counters" in data and "streaks" in data and "punishment_triggers" in data
     msg = build_assistant_message(today)
     assert isinstance(msg, str) and len(msg) > 0
+    # Paging through the schedule yields exactly the day's rows, in order
+    from sync import get_schedule_items_for_date
+    paged, after = [], 0
+    while after is not None:
+        page = get_today_brief(today, schedule_after=after, schedule_limit=2)
+        assert len(page["schedule"]) <= 2
+        paged += page["schedule"]
+        after = page["schedule_next"]
+    assert paged == get_schedule_items_for_date(today)
+    print("OK")
+
+def test_generate_range():
+    print("6. Range schedule generation...", end=" ")
+    from sync import generate_schedule_for_range
+    days = generate_schedule_for_range("2025-02-01", "2025-02-07")
+    assert list(days) == [f"2025-02-0{i}" for i in range(1, 8)]
+    again = generate_schedule_for_range("2025-02-01", "2025-02-07")
+    assert sum(again.values()) == 0, "Range generation should be idempotent"
+    print(f"OK ({sum(days.values())} row(s))")
+
+def test_archive():
+    print("7. History archiving...", end=" ")
+    from datetime import date
+    from sync import generate_schedule_for_range
+    from archive import archive_history, get_completion_history
+    generate_schedule_for_range("2020-01-01", "2020-01-02")
+    before = get_completion_history("2020-01-01", "2020-01-02")
+    result = archive_history(30, today=date(2020, 3, 1))
+    after = get_completion_history("2020-01-01", "2020-01-02")
+    assert result["cutoff"] == "2020-01-31"
+    assert [d["total_items"] for d in after] == [d["total_items"] for d in before]
+    # The daily aggregates are maintained by check-offs, not recomputed
+    from assistant import get_today_brief, mark_schedule_done
+    from archive import get_heatmap
+    generate_schedule_for_range("2020-06-01", "2020-06-01")
+    item = [s for s in get_today_brief("2020-06-01")["schedule"] if s["date"] == "2020-06-01"][0]
+    from db import get_conn
+    conn = get_conn()
+    events_sql = "SELECT COUNT(*) FROM activity_log WHERE action_type = 'schedule_done' AND target_id = ?"
+    mark_schedule_done(item["id"])
+    logged = conn.execute(events_sql, (item["id"],)).fetchone()[0]
+    assert not mark_schedule_done(item["id"]), "a second check-off is a no-op"
+    assert conn.execute(events_sql, (item["id"],)).fetchone()[0] == logged
+    conn.close()
+    day = get_heatmap(2020)["days"]
+    assert [d["completed"] for d in day if d["date"] == "2020-06-01"] == [1], day
+    print(f"OK (archived {result['schedule_rows']} row(s))")
+
+def test_activity_log():
+    print("8. Activity log & rebuild...", end=" ")
+    from sync import get_counters
+    from assistant import increment_counter
+    from activity import rebuild_from_log
+    from import_text import import_from_text
+    import_from_text("Poll winner = 7 days locked.", "test_run")
+    counter = get_counters()[0]
+    increment_counter(counter["id"], 2)
+    before = {c["id"]: c["current_value"] for c in get_counters()}
+    rebuild_from_log()
+    after = {c["id"]: c["current_value"] for c in get_counters()}
+    assert before == after, f"Rebuild changed counters: {before} -> {after}"
+    # The event is durable as soon as the check-off returns, even if the process dies right after
+    import subprocess
+    code = f"import os, assistant; assistant.increment_counter({counter['id']}, 1); os._exit(0)"
+    subprocess.run([sys.executable, "-c", code], check=True)
+    rebuild_from_log()
+    assert get_counters()[0]["current_value"] == before[counter["id"]] + 1
+    # Check-offs that arrive while a commit is in flight are committed together, by one thread
+    import threading
+    import activity
+    from db import current_db_path
+    started, gate, ran, results = threading.Event(), threading.Event(), {}, {}
+
+    def op(cur, tag, events):
+        if tag == 0:
+            started.set()
+            gate.wait(5)
+        ran[tag] = threading.get_ident()
+        if tag == 3:
+            raise KeyError(tag)
+        return tag
+
+    def run(tag):
+        try:
+            results[tag] = activity.group_commit(op, tag)
+        except KeyError:
+            results[tag] = "error"
+
+    threads = [threading.Thread(target=run, args=(tag,)) for tag in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for th in threads[1:]:
+        th.start()
+    while len(activity._queued.get(str(current_db_path()), [])) < 4:
+        threading.Event().wait(0.001)
+    gate.set()
+    for th in threads:
+        th.join(5)
+    assert results == {0: 0, 1: 1, 2: 2, 3: "error", 4: 4}, results
+    assert len({ran[1], ran[2], ran[3], ran[4]}) == 1 and ran[1] != ran[0]
+    # Synthetic data is consistent with its own event log
+    import tempfile
+    from db import get_conn, init_db, using_db
+    from synthetic import generate
+    with tempfile.TemporaryDirectory() as tmp, using_db(f"{tmp}/synthetic.db"):
+        init_db()
+        generate(200, 30)
+        state_sql = ("SELECT (SELECT group_concat(current_value) FROM counters), "
+                     "(SELECT group_concat(current_streak || '/' || longest_streak) FROM streaks), "
+                     "(SELECT group_concat(current_streak || '/' || best_streak) FROM commitments)")
+        conn = get_conn()
+        before = tuple(conn.execute(state_sql).fetchone())
+        conn.close()
+        rebuild_from_log()
+        conn = get_conn()
+        assert tuple(conn.execute(state_sql).fetchone()) == before, "Synthetic history disagrees with its log"
+        clash = conn.execute("SELECT date, title FROM schedule_items ORDER BY id LIMIT 1").fetchone()
+        items = conn.execute("SELECT COUNT(*) FROM schedule_items").fetchone()[0]
+        conn.close()
+        # An export imports into a database that already has a schedule item on the same (date, title)
+        from transfer import export_ndjson, import_ndjson
+        lines = "".join(export_ndjson()).splitlines()
+        with using_db(f"{tmp}/target.db"):
+            init_db()
+            conn = get_conn()
+            conn.execute("INSERT INTO schedule_items (date, title) VALUES (?, ?)", tuple(clash))
+            conn.commit()
+            conn.close()
+            counts = import_ndjson(lines)
+            assert counts["schedule_items"] == items - 1, counts
+            assert counts["commitments"] == 200, counts
+            # A paused export (a slow client) holds a read snapshot but doesn't block writers
+            export = export_ndjson(batch_size=1)
+            next(export), next(export)
+            conn = get_conn()
+            conn.execute("INSERT INTO schedule_items (date, title) VALUES ('2025-01-01', 'during export')")
+            conn.commit()
+            conn.close()
+            export.close()
+    print("OK")
+
+def test_scheduler():
+    print("10. Reminder scheduler...", end=" ")
+    from scheduler import next_occurrence
+    assert next_occurrence("2026-01-01T09:00:00", "daily", "2026-01-05T10:00:00") == "2026-01-06T09:00:00"
+    assert next_occurrence("2026-01-01T09:00:00", "weekly", "2026-01-01T09:00:00") == "2026-01-08T09:00:00"
+    assert next_occurrence("2026-01-01T09:00:00", None, "2026-01-05T10:00:00") is None
+    # A checked-off daily reminder skips the pending occurrence and reopens when the next one fires
+    from scheduler import ReminderScheduler, next_due_after_done
+    from assistant import mark_reminder_done
+    from db import get_conn
+    assert next_due_after_done("2026-01-05T21:00:00", "21:00", "daily", "2026-01-05T10:00:00") == "2026-01-06T21:00:00"
+    assert next_due_after_done("2026-01-05T21:00:00", "21:00", None, "2026-01-05T10:00:00") is None
+    conn = get_conn()
+    cur = conn.execute("INSERT INTO reminders (title, at_time, recurrence, done, created_at) VALUES ('t', '09:00', 'daily', 0, '')")
+    rid = cur.lastrowid
+    conn.commit()
+    conn.close()
+    assert mark_reminder_done(rid)
+    conn = get_conn()
+    done, next_due = conn.execute("SELECT done, next_due FROM reminders WHERE id = ?", (rid,)).fetchone()
+    conn.close()
+    assert done == 1 and next_due, (done, next_due)
+    ReminderScheduler([lambda r: None]).run_pending(next_due)
+    conn = get_conn()
+    done, later = conn.execute("SELECT done, next_due FROM reminders WHERE id = ?", (rid,)).fetchone()
+    conn.close()
+    assert done == 0 and later > next_due, (done, later)
     print("OK")
 
 def test_flask_app():
-    print("6. Flask app (routes exist)...", end=" ")
+    print("9. Flask app (routes exist)...", end=" ")
     from app import app
     with app.test_client() as c:
         r = c.get("/")
         assert r.status_code == 200, f"GET / => {r.status_code}"
+        css = re.search(r'href="(/assets/css/index\.[0-9a-f]+\.css)"', r.get_data(as_text=True)).group(1)
+        r = c.get(css, headers={"Accept-Encoding": "gzip"})
+        assert r.status_code == 200 and "immutable" in r.headers["Cache-Control"]
+        plain = c.get(css, headers={"Accept-Encoding": "identity"})
+        assert plain.headers["ETag"] != r.headers["ETag"] and "Accept-Encoding" in r.headers["Vary"]
+        assert c.get("/manage").status_code == 200
+        r = c.get("/api/search?q=locked")
+        assert r.status_code == 200
+        hits = r.get_json()["commitments"]
+        assert hits and "<mark>" in hits[0]["raw_text"], hits
+        assert c.get("/api/search?q=x&kind=nope").status_code == 400
+        page = c.get("/api/commitments?limit=1").get_json()
+        assert len(page["commitments"]) == 1 and page["commitments"][0]["source_label"] in ("Tumblr", "Import")
+        if page["next_before"]:
+            older = c.get(f"/api/commitments?limit=1&before={page['next_before']}").get_json()
+            assert older["commitments"][0]["id"] < page["commitments"][0]["id"]
+        r = c.post("/api/commitments/bulk", json={"action": "exclude", "filters": {"min_confidence": 0}, "dry_run": True})
+        assert r.status_code == 200 and r.get_json()["count"] >= 0
+        bad = {"action": "exclude", "filters": {"min_confidence": "high"}}
+        assert c.post("/api/commitments/bulk", json=bad).status_code == 400
+        assert c.post("/api/commitments/bulk", json={"action": "exclude"}).status_code == 400
+        typo = {"action": "exclude", "filters": {"min_confidnce": 0.9}}
+        assert c.post("/api/commitments/bulk", json=typo).status_code == 400
+        assert c.get("/manage?status=pending&older_than=30").status_code == 200
+        older = re.search(r'href="([^"]*before=[^"]*)"', c.get("/manage?limit=1").get_data(as_text=True))
+        assert older is None or "limit=1" in older.group(1), older.group(1)
+        # "All matching" asks first: the count is only computed on the confirm step
+        r = c.post("/manage/bulk", data={"action": "exclude_matching", "blog": "no-such-blog"})
+        assert r.status_code == 302 and "confirm=exclude" in r.headers["Location"]
+        assert "Exclude 0 commitment(s)" in c.get(r.headers["Location"]).get_data(as_text=True)
+        lines = c.get("/api/export").get_data(as_text=True).splitlines()
+        assert json.loads(lines[0])["type"] == "meta" and len(lines) > 1
+        assert c.post("/api/import", data=lines[0] + "\n").get_json() == {"imported": {}}
+        assert c.post("/api/import", data="not json\n").status_code == 400
+        text = c.get("/metrics").get_data(as_text=True)
+        assert 'http_requests_total{route="/api/import",method="POST",status="400"}' in text
+        assert "sqlite_statements_total{caller=" in text
+        # Shared query helpers are skipped: each getter gets its own series
+        assert 'caller="sync._counters"' in text and 'caller="sync._fetch_visible"' not in text
+        assert c.get("/admin/profiles").status_code == 403
+        # One profile at a time: a request that asks while another run is active goes unprofiled, not 500
+        import app as app_module
+        from profiling import Profile
+        token, app_module.ADMIN_TOKEN = app_module.ADMIN_TOKEN, "test-token"
+        outer = Profile("outer").start()
+        try:
+            assert outer is not None and Profile("inner").start() is None
+            r = c.get("/api/today", headers={"X-Profile": "1", "X-Admin-Token": "test-token"})
+            assert r.status_code == 200
+            # The profiles page is HTML for a browser signed in with the token; JSON stays behind ?format=json
+            assert c.post("/admin/profiles", data={"token": "wrong"}).status_code == 403
+            assert c.post("/admin/profiles", data={"token": "test-token"}).status_code == 302
+            r = c.get("/admin/profiles")
+            assert r.status_code == 200 and r.mimetype == "text/html" and "Slowest requests" in r.get_data(as_text=True)
+            assert "profiles" in c.get("/admin/profiles?format=json").get_json()
+        finally:
+            outer.stop()
+            app_module.ADMIN_TOKEN = token
+        assert c.get("/admin/profiles?format=json").status_code == 403  # token changed: signed out
         r = c.get("/api/today")
         assert r.status_code == 200
         j = r.get_json()
@@ -60,6 +300,8 @@ def test_flask_app():
         assert r.status_code == 200
         j = r.get_json()
         assert "message" in j
+        # The Today page swaps in message_html after a check-off, so it must match the server-rendered message
+        assert "**" not in j["message_html"] and j["message_html"] in c.get("/").get_data(as_text=True)
         r = c.get("/import")
         assert r.status_code == 200
         r = c.get("/sync")
@@ -71,6 +313,42 @@ def test_flask_app():
         r = c.get("/api/assistant-message?date=2025-01-15")
         assert r.status_code == 200
         assert "message" in r.get_json()
+        etag = r.headers.get("ETag")
+        assert etag
+        r = c.get("/api/assistant-message?date=2025-01-15", headers={"If-None-Match": etag})
+        assert r.status_code == 304
+        r = c.get("/api/today?date=2025-01-15&include=message")
+        assert r.status_code == 200
+        assert "message" in r.get_json() and "schedule" in r.get_json()
+        r = c.post("/api/generate?from=2025-03-01&to=2025-03-03")
+        assert r.status_code == 200
+        assert set(r.get_json()["days"]) == {"2025-03-01", "2025-03-02", "2025-03-03"}
+        r = c.get("/api/range?from=2025-03-01&to=2025-03-03")
+        assert r.status_code == 200
+        j = r.get_json()
+        assert [d["date"] for d in j["days"]] == ["2025-03-01", "2025-03-02", "2025-03-03"]
+        assert "counters" in j and "streaks" in j
+        r = c.get("/api/heatmap?year=2025")
+        assert r.status_code == 200 and "days" in r.get_json()
+        assert c.get("/api/heatmap?year=abc").status_code == 400
+        item = c.get("/api/today").get_json()["schedule"][0]
+        r = c.post("/api/checkoff", json=[{"type": "schedule", "id": item["id"]}, {"type": "reminder", "id": 0}])
+        assert r.status_code == 200
+        j = r.get_json()
+        assert [x["ok"] for x in j["results"]] == [not item["completed"], False]
+        assert j["changed"]["schedule"][0]["completed"] == 1
+        assert c.post("/api/checkoff", json=[{"type": "nope", "id": 1}]).status_code == 400
+        assert c.get("/api/stream").status_code == 404  # opt-in
+        app.config["LIVE_UPDATES"] = True
+        r = c.get("/api/stream", buffered=False)
+        assert r.mimetype == "text/event-stream"
+        assert b"event: brief" in next(iter(r.response))
+        r.close()
+        app.config["LIVE_UPDATES"] = False
+        r = c.get("/api/history?from=2025-03-01&to=2025-03-03")
+        assert r.status_code == 200 and "days" in r.get_json()
+        r = c.post("/api/generate?from=2025-03-03&to=2025-03-01")
+        assert r.status_code == 400
         # POST import
         r = c.post("/import", data={"text": "Daily: drink water. If you skip, then no treat."}, follow_redirects=False)
         assert r.status_code in (200, 302)
@@ -83,7 +361,11 @@ def main():
         test_parser()
         test_import_flow()
         test_today_brief()
+        test_generate_range()
+        test_archive()
+        test_activity_log()
         test_flask_app()
+        test_scheduler()
         print("\nAll checks passed.")
         return 0
     except Exception as e:
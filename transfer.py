@@ -0,0 +1,226 @@
+"""NDJSON export and import of a whole database, for moving a user between instances or seeding a test DB.
+
+One JSON object per line: a {"type": "meta", ...} header, then one line per row with "type" set to its
+table. Tables are written parents first (posts, commitments, then rows that point at them), so the
+importer can remap ids as it goes without holding the file in memory. app_settings is not exported:
+it holds this instance's Tumblr tokens and sync cooldowns.
+
+python transfer.py export out.ndjson [--user NAME]
+python transfer.py import in.ndjson [--user NAME]
+"""
+import argparse
+import json
+import sqlite3
+import sys
+from typing import Iterable, Iterator, Optional
+
+from db import bump_data_generation, get_conn, init_db, now_iso, using_db, user_db_path
+
+FORMAT = "good-girl-assistant"
+VERSION = 1
+# Rows read per fetch on export, and rows per transaction on import
+BATCH_SIZE = 1000
+
+# Export order: every table after the ones its ids point at
+TABLES = (
+    "tumblr_posts",
+    "commitments",
+    "reminders",
+    "schedule_items",
+    "counters",
+    "streaks",
+    "punishment_triggers",
+    "schedule_daily_summary",
+    "activity_log",
+    "activity_daily_summary",
+)
+# Tables whose rows get new ids on import (others keep their key or have none)
+_NEW_IDS = {"commitments", "reminders", "schedule_items", "counters", "streaks", "punishment_triggers", "activity_log"}
+# Which table an activity event's target_id points at
+_TARGETS = {
+    "schedule_done": "schedule_items",
+    "reminder_done": "reminders",
+    "counter_increment": "counters",
+    "streak_log": "streaks",
+    "commitment_day_done": "commitments",
+}
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def export_ndjson(batch_size: int = BATCH_SIZE) -> Iterator[str]:
+    """NDJSON for the current database in chunks of whole lines, read from one snapshot in batches."""
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN")  # one read snapshot, so rows written mid-export can't dangle
+        yield _encode({"type": "meta", "format": FORMAT, "version": VERSION, "exported_at": now_iso()}) + "\n"
+        for table in TABLES:
+            cur.execute(f"SELECT * FROM {table}")
+            columns = ["type"] + [d[0] for d in cur.description]
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                # One chunk per batch rather than per row: far fewer writes for the WSGI server
+                yield "".join(_encode(dict(zip(columns, (table, *row)))) + "\n" for row in rows)
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+class _Importer:
+    """Inserts rows one table at a time, mapping exported ids to the ids they get here."""
+
+    def __init__(self, cur):
+        self.cur = cur
+        self.ids: dict = {table: {} for table in _TARGETS.values()}  # exported id -> new id
+        self.existing: set = set()  # exported ids of commitments already present here
+        self.counts: dict = {}
+        self._columns: dict = {}
+        self._statements: dict = {}  # (table, row keys, or_ignore) -> (sql, columns)
+
+    def _table_columns(self, table: str) -> set:
+        if table not in self._columns:
+            self.cur.execute(f"PRAGMA table_info({table})")
+            self._columns[table] = {r[1] for r in self.cur.fetchall()}
+        return self._columns[table]
+
+    def _commitment(self, old_id) -> tuple:
+        """(keep, new id) for a row's commitment_id. Rows of commitments that already existed are
+        dropped (re-importing a file is a no-op), as are rows pointing at commitments not in the file."""
+        if old_id in (None, 0):
+            return True, old_id
+        if old_id in self.existing:
+            return False, None
+        new_id = self.ids["commitments"].get(old_id)
+        return new_id is not None, new_id
+
+    def _insert(self, table: str, row: dict, or_ignore: bool = False) -> Optional[int]:
+        """Insert the row's known columns; returns the new rowid, or None if ignored as a duplicate."""
+        key = (table, tuple(row), or_ignore)
+        stmt = self._statements.get(key)
+        if stmt is None:
+            known = self._table_columns(table)
+            cols = [c for c in row if c in known]
+            sql = (
+                f"INSERT {'OR IGNORE ' if or_ignore else ''}INTO {table} ({', '.join(cols)}) "
+                f"VALUES ({', '.join('?' * len(cols))})"
+            )
+            stmt = self._statements[key] = (sql, cols)
+        sql, cols = stmt
+        self.cur.execute(sql, [row[c] for c in cols])
+        return self.cur.lastrowid if self.cur.rowcount else None
+
+    def add(self, table: str, row: dict) -> None:
+        if table not in TABLES:
+            raise ValueError(f"unknown type {table!r}")
+        old_id = row.pop("id", None) if table in _NEW_IDS else None
+        if table == "tumblr_posts":
+            if self._insert(table, row, or_ignore=True) is None:
+                return
+        elif table == "commitments":
+            new_id = self._insert(table, row, or_ignore=True)
+            if new_id is None:
+                self.existing.add(old_id)
+                return
+            self.ids[table][old_id] = new_id
+        else:
+            keep, row["commitment_id"] = self._commitment(row.get("commitment_id"))
+            if not keep:
+                return
+            if "target_id" in row and table.startswith("activity_"):
+                target_table = _TARGETS.get(row.get("action_type"))
+                if target_table and row["target_id"] not in (None, 0):
+                    row["target_id"] = self.ids[target_table].get(row["target_id"])
+                    if row["target_id"] is None:
+                        return
+            # A schedule item may clash with one already here on (date, title); keep ours and leave the
+            # exported id unmapped, so events pointing at it are dropped rather than moved onto ours
+            new_id = self._insert(table, row, or_ignore=table in ("schedule_items", "schedule_daily_summary"))
+            if new_id is None:
+                return
+            if table in self.ids:
+                self.ids[table][old_id] = new_id
+        self.counts[table] = self.counts.get(table, 0) + 1
+
+
+def import_ndjson(lines: Iterable, batch_size: int = BATCH_SIZE) -> dict:
+    """Load an export into the current database, batch_size rows per transaction.
+    Commitments already here (same post and text) are kept and their exported rows skipped.
+    Raises ValueError on a malformed line; its batch is rolled back, earlier ones stay committed. Returns rows added per table."""
+    conn = get_conn()
+    importer = _Importer(conn.cursor())
+    try:
+        cur = importer.cur
+        pending = 0
+        seen_meta = False
+        for lineno, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"line {lineno}: invalid JSON ({e.msg})")
+            if not isinstance(obj, dict):
+                raise ValueError(f"line {lineno}: expected an object")
+            kind = obj.pop("type", None)
+            if not seen_meta:
+                if kind != "meta" or obj.get("format") != FORMAT:
+                    raise ValueError("not an export: the first line must be its meta header")
+                if obj.get("version") != VERSION:
+                    raise ValueError(f"unsupported export version {obj.get('version')!r}")
+                seen_meta = True
+                continue
+            if pending == 0:
+                cur.execute("BEGIN IMMEDIATE")
+            try:
+                importer.add(kind, obj)
+            except (ValueError, sqlite3.Error) as e:
+                raise ValueError(f"line {lineno}: {e}")
+            pending += 1
+            if pending >= batch_size:
+                conn.commit()
+                pending = 0
+        if pending:
+            conn.commit()
+    finally:
+        conn.rollback()
+        conn.close()
+        if importer.counts:
+            bump_data_generation()
+    return importer.counts
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Export or import a database as NDJSON")
+    ap.add_argument("command", choices=["export", "import"])
+    ap.add_argument("file", help="NDJSON file, or - for stdout/stdin")
+    ap.add_argument("--user", help="per-user database of this Tumblr user (default: the shared database)")
+    args = ap.parse_args(argv)
+    with using_db(user_db_path(args.user) if args.user else None):
+        init_db()
+        if args.command == "export":
+            out = sys.stdout if args.file == "-" else open(args.file, "w", encoding="utf-8")
+            try:
+                out.writelines(export_ndjson())
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            return 0
+        src = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+        try:
+            counts = import_ndjson(src)
+        except ValueError as e:
+            print(f"Import failed: {e}", file=sys.stderr)
+            return 1
+        finally:
+            if src is not sys.stdin:
+                src.close()
+    print("Imported: " + (", ".join(f"{n} {table}" for table, n in counts.items()) or "nothing new"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
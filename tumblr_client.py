@@ -11,9 +11,10 @@ from config import (
 )
 
 
-def _get_client():
+def _get_client(token: str = None, secret: str = None):
     import pytumblr
-    token, secret = get_tumblr_oauth_token_secret()
+    if not token or not secret:
+        token, secret = get_tumblr_oauth_token_secret()
     return pytumblr.TumblrRestClient(
         TUMBLR_CONSUMER_KEY,
         TUMBLR_CONSUMER_SECRET,
@@ -52,6 +53,17 @@ def get_authenticated_user_primary_blog() -> str:
         return ""
 
 
+def get_user_name(token: str, secret: str) -> str:
+    """Return the Tumblr account name for an access token (from /v2/user/info), or empty string on error."""
+    try:
+        resp = _get_client(token, secret).info()
+        if not resp or "response" not in resp or "user" not in resp["response"]:
+            return ""
+        return (resp["response"]["user"].get("name") or "").strip()
+    except Exception:
+        return ""
+
+
 def fetch_posts(blog: str = None, limit_per_batch: int = 50, max_posts: int = 500) -> list[dict]:
     """Fetch posts from blog. Returns list of {id, blog_name, body_text, created_at}."""
     blog = (blog or TUMBLR_BLOG).strip()